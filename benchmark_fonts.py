@@ -0,0 +1,119 @@
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from fake_google_fonts_server import FakeGoogleFonts
+from font_pairings import PAIRINGS_SOURCE
+
+# Runs download_fonts.py against the local Google Fonts stand-in in a scratch project directory
+REPO_DIR = Path(__file__).resolve().parent
+DOWNLOAD_SCRIPT = REPO_DIR / "download_fonts.py"
+
+# Cold: empty caches and store. Warm: everything cached. Revalidate: cached, but every CSS URL rechecked.
+RUNS = [
+    ("cold", []),
+    ("warm", []),
+    ("revalidate", ["--refresh-css"]),
+]
+
+def output_files(project_dir):
+    """{path: (mtime_ns, size)} of everything the pipeline writes: fonts, bundles, manifest and CSS (not caches)."""
+    paths = [project_dir / "font_manifest.json", project_dir / "generated_font_faces.css"]
+    for root, _, files in os.walk(project_dir / "public"):
+        paths.extend(Path(root) / name for name in files)
+    result = {}
+    for path in paths:
+        try:
+            st = path.stat()
+        except OSError:
+            continue
+        result[path] = (st.st_mtime_ns, st.st_size)
+    return result
+
+def bytes_written(before, after):
+    """Size of the output files a run created or rewrote."""
+    return sum(size for path, (mtime, size) in after.items() if before.get(path, (None,))[0] != mtime)
+
+def run_download(project_dir, base_url, workers, extra_args):
+    env = dict(os.environ)
+    env.update({
+        'GOOGLE_FONTS_CSS_URL': f"{base_url}/css2",
+        'GOOGLE_FONTS_STATIC_URL': base_url,
+        # Keep the run's metrics reports out of the repository's .metrics
+        'RUN_METRICS_DIR': str(project_dir / ".metrics"),
+    })
+    command = [sys.executable, str(DOWNLOAD_SCRIPT), "--workers", str(workers), *extra_args]
+    started = time.perf_counter()
+    result = subprocess.run(command, cwd=project_dir, env=env, capture_output=True, text=True)
+    elapsed = time.perf_counter() - started
+    if result.returncode != 0:
+        print(result.stdout[-2000:], file=sys.stderr)
+        print(result.stderr[-2000:], file=sys.stderr)
+    return elapsed, result.returncode
+
+def benchmark(workers, latency, fixtures_dir=None, truncate_rate=0.0):
+    fake = FakeGoogleFonts(fixtures_dir, latency=latency, truncate_rate=truncate_rate, seed=workers)
+    base_url = fake.start()
+    rows = []
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            project_dir = Path(tmp_dir)
+            # The bundle step reads FONT_PAIRINGS from the carousel constants
+            (project_dir / PAIRINGS_SOURCE).parent.mkdir(parents=True)
+            shutil.copy(REPO_DIR / PAIRINGS_SOURCE, project_dir / PAIRINGS_SOURCE)
+            for run, extra_args in RUNS:
+                fake.reset_counts()
+                before = output_files(project_dir)
+                elapsed, returncode = run_download(project_dir, base_url, workers, extra_args)
+                counts = fake.counts
+                after = output_files(project_dir)
+                families = len(counts['css_by_family'])
+                rows.append({
+                    'run': run,
+                    'workers': workers,
+                    'seconds': round(elapsed, 3),
+                    'css_requests': counts['css_requests'],
+                    'css_per_family': round(counts['css_requests'] / families, 2) if families else 0,
+                    'font_requests': counts['font_requests'],
+                    'not_modified': counts['not_modified'],
+                    'resumed': counts['resumed'],
+                    'bytes_downloaded': counts['bytes_served'],
+                    'bytes_written': bytes_written(before, after),
+                    'output_bytes': sum(size for _, size in after.values()),
+                    'exit_code': returncode,
+                })
+    finally:
+        fake.stop()
+    return rows
+
+def print_table(rows):
+    columns = ['run', 'workers', 'seconds', 'css_requests', 'css_per_family', 'font_requests',
+               'not_modified', 'resumed', 'bytes_downloaded', 'bytes_written', 'output_bytes', 'exit_code']
+    print(" ".join(f"{column:>16}" for column in columns))
+    for row in rows:
+        print(" ".join(f"{row[column]:>16}" for column in columns))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark download_fonts.py against a local Google Fonts stand-in.")
+    parser.add_argument("--workers", type=int, nargs="+", default=[8], help="Worker counts to benchmark")
+    parser.add_argument("--latency", type=float, default=0.03, help="Seconds the fake adds to every response")
+    parser.add_argument("--truncate-rate", type=float, default=0.0,
+                        help="Fraction of font responses the fake cuts off halfway (resumed on the next run)")
+    parser.add_argument("--fixtures", default=None, help="Replay a directory recorded with fake_google_fonts_server.py --record")
+    parser.add_argument("--json", dest="json_path", default=None, help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    rows = []
+    for workers in args.workers:
+        print(f"Benchmarking with {workers} workers...", file=sys.stderr)
+        rows.extend(benchmark(workers, args.latency, args.fixtures, args.truncate_rate))
+    print_table(rows)
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
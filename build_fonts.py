@@ -0,0 +1,231 @@
+import argparse
+import ast
+import functools
+import hashlib
+import json
+import os
+import sys
+import time
+
+import run_metrics
+
+# Fingerprints of every stage's inputs and outputs from the last successful build
+BUILD_DB_FILE = os.path.join(".font_cache", "build_db.json")
+
+FONT_DIR = "public/fonts"
+PAIRINGS_SOURCE = "constants/carouselConstants.js"
+# The pipeline modules live next to this script
+MODULE_DIR = os.path.dirname(os.path.abspath(__file__))
+# Imported by the stages, but do not change what they produce
+NON_PIPELINE_MODULES = {"run_metrics"}
+
+def fingerprint_path(path):
+    """Cheap fingerprint from stat data: (mtime, size) for files, every entry's for directories."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    if not os.path.isdir(path):
+        return [st.st_mtime_ns, st.st_size]
+    entries = []
+    with os.scandir(path) as it:
+        for entry in it:
+            if entry.is_file():
+                entry_st = entry.stat()
+                entries.append([entry.name, entry_st.st_mtime_ns, entry_st.st_size])
+    entries.sort()
+    return hashlib.sha256(json.dumps(entries).encode('utf-8')).hexdigest()
+
+@functools.lru_cache(maxsize=None)
+def module_inputs(module):
+    """Paths of a pipeline module and every project module it imports, transitively."""
+    path = os.path.join(MODULE_DIR, f"{module}.py")
+    with open(path, "r", encoding="utf-8") as f:
+        tree = ast.parse(f.read(), path)
+    imported = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            imported.update(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            imported.add(node.module)
+    paths = {path}
+    for name in imported - NON_PIPELINE_MODULES - {module}:
+        if os.path.exists(os.path.join(MODULE_DIR, f"{name}.py")):
+            paths.update(module_inputs(name))
+    return frozenset(paths)
+
+def modules(*names):
+    return sorted(set().union(*(module_inputs(name) for name in names)))
+
+def fingerprint(paths, values=None):
+    data = {'paths': {path: fingerprint_path(path) for path in paths}, 'values': values}
+    return hashlib.sha256(json.dumps(data, sort_keys=True).encode('utf-8')).hexdigest()
+
+class Stage:
+    """A build step with declared inputs and outputs.
+
+    inputs may also be a callable returning the paths, for inputs only known at build time.
+    """
+    def __init__(self, name, inputs, outputs, run, values=None):
+        self.name = name
+        self.inputs = inputs
+        self.outputs = outputs
+        self.run = run
+        self.values = values
+
+    def input_fingerprint(self):
+        inputs = self.inputs() if callable(self.inputs) else self.inputs
+        return fingerprint(inputs, self.values() if self.values else None)
+
+    def output_fingerprint(self):
+        return fingerprint(self.outputs)
+
+def load_build_db():
+    try:
+        with open(BUILD_DB_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_build_db(db):
+    os.makedirs(os.path.dirname(BUILD_DB_FILE), exist_ok=True)
+    tmp_path = BUILD_DB_FILE + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(db, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, BUILD_DB_FILE)
+
+def run_download(workers):
+    # Families are fetched in parallel; unchanged CSS and fonts come from the cache and store
+    from download_fonts import download_fonts, MAX_WORKERS
+    download_fonts(max_workers=workers or MAX_WORKERS)
+
+def run_verify(workers):
+    import font_store
+    problems = font_store.verify_manifest(font_store.load_manifest(), max_workers=workers or 8)
+    for name, problem in problems:
+        print(f"  Corrupt font {name}: {problem}", file=sys.stderr)
+    if problems:
+        # Not recorded in the build database, so the stage runs again after the next download
+        raise SystemExit(f"{len(problems)} stored fonts failed verification; run `build_fonts.py --force --only download` to refetch them")
+    print("  All stored fonts match the manifest.")
+
+def run_rename(workers):
+    import rename_fonts
+    rename_fonts.main()
+
+def run_update_css(workers):
+    import update_css_font_urls
+    update_css_font_urls.update_css()
+
+def run_convert(workers):
+    import convert_fonts
+    convert_fonts.convert_fonts(max_workers=workers)
+
+def run_subset(workers):
+    import subset_fonts
+    subset_fonts.subset_fonts(subset_fonts.parse_unicode_range(subset_fonts.DEFAULT_UNICODES), max_workers=workers)
+
+def manifest_store_files():
+    """The store files font_manifest.json lists (not the whole font directory, which rename changes)."""
+    import font_store
+    return sorted({os.path.join(FONT_DIR, face['file']) for face in font_store.load_manifest()['faces']})
+
+def build_stages(with_subset=False, with_convert=False):
+    import font_store
+    import update_css_font_urls
+    manifest = str(font_store.FONT_MANIFEST_FILE)
+    stages = [
+        Stage(
+            "download",
+            inputs=modules("download_fonts") + [PAIRINGS_SOURCE],
+            outputs=[manifest, "generated_font_faces.css", os.path.join(FONT_DIR, "css", "preload-manifest.json")],
+            run=run_download,
+        ),
+        Stage(
+            "verify",
+            inputs=lambda: modules("font_store") + [manifest] + manifest_store_files(),
+            outputs=[],
+            run=run_verify,
+        ),
+        Stage(
+            "rename",
+            inputs=modules("rename_fonts") + [FONT_DIR],
+            outputs=[FONT_DIR],
+            run=run_rename,
+        ),
+    ]
+    if with_convert:
+        import convert_fonts
+        stages.append(Stage(
+            "convert",
+            inputs=modules("convert_fonts") + [FONT_DIR],
+            outputs=[str(convert_fonts.CONVERTED_MANIFEST_FILE), str(convert_fonts.CONVERTED_CSS_FILE)],
+            run=run_convert,
+        ))
+    stages += [
+        Stage(
+            "update-css",
+            inputs=modules("update_css_font_urls") + [update_css_font_urls.CSS_FILE, update_css_font_urls.CONVERTED_CSS_FILE, FONT_DIR],
+            outputs=[update_css_font_urls.OUTPUT_CSS_FILE],
+            run=run_update_css,
+        ),
+    ]
+    if with_subset:
+        stages.append(Stage(
+            "subset",
+            inputs=modules("subset_fonts") + [manifest, PAIRINGS_SOURCE],
+            outputs=["font_subset_manifest.json", "generated_font_faces_subset.css"],
+            run=run_subset,
+        ))
+    return stages
+
+def build(force=False, only=None, workers=None, with_subset=False, with_convert=False):
+    started = time.perf_counter()
+    db = load_build_db()
+    for stage in build_stages(with_subset, with_convert):
+        if only and stage.name not in only:
+            continue
+        if force and stage.name in db:
+            # Only the forced stages lose their records; a failed run leaves them dirty
+            del db[stage.name]
+            save_build_db(db)
+        record = db.get(stage.name, {})
+        if (
+            record.get('inputs') == stage.input_fingerprint()
+            and record.get('outputs') == stage.output_fingerprint()
+        ):
+            print(f"[{stage.name}] up to date")
+            run_metrics.inc("build_stages_total", result="up-to-date")
+            continue
+        run_metrics.inc("build_stages_total", result="ran")
+        print(f"[{stage.name}] running")
+        stage_started = time.perf_counter()
+        with run_metrics.stage(f"build/{stage.name}"), run_metrics.profile(f"build-{stage.name}"):
+            stage.run(workers)
+        # Fingerprints are taken after the run so a stage's own writes do not re-trigger it
+        db[stage.name] = {
+            'inputs': stage.input_fingerprint(),
+            'outputs': stage.output_fingerprint(),
+        }
+        save_build_db(db)
+        print(f"[{stage.name}] done in {time.perf_counter() - stage_started:.2f}s")
+    print(f"Font build finished in {time.perf_counter() - started:.2f}s")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Incrementally build fonts: download -> verify -> rename -> update CSS.")
+    parser.add_argument("--force", action="store_true", help="Run the selected stages even if their fingerprints match")
+    parser.add_argument("--only", action="append", help="Run only this stage (repeatable)")
+    parser.add_argument("--workers", type=int, default=None, help="Concurrency passed to the stages")
+    parser.add_argument("--subset", action="store_true", help="Also run the subset stage (needs fontTools)")
+    parser.add_argument("--convert", action="store_true",
+                        help="Also recompress bundled TTF/OTF/WOFF fonts to woff2 (needs fontTools)")
+    parser.add_argument("--profile", action="store_true",
+                        help="Capture a cProfile of every stage that runs in the metrics report")
+    args = parser.parse_args()
+    if args.profile:
+        run_metrics.enable_profiling()
+    run_metrics.write_report_at_exit("build_fonts")
+    try:
+        build(force=args.force, only=args.only, workers=args.workers, with_subset=args.subset, with_convert=args.convert)
+    except KeyboardInterrupt:
+        sys.exit(130)
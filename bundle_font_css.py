@@ -0,0 +1,108 @@
+import argparse
+import json
+import re
+from pathlib import Path
+
+import font_store
+from font_pairings import load_font_pairings
+
+# Bundles are served next to the fonts so they can be linked per page
+BUNDLE_DIR = font_store.FONT_STORE_DIR / "css"
+PRELOAD_MANIFEST_FILE = BUNDLE_DIR / "preload-manifest.json"
+FONT_URL_PREFIX = "/fonts/"
+FONT_DISPLAY_PARAM = "swap"
+
+# Faces covering this code point ('A') are the ones a Latin page always needs
+PRELOAD_CODEPOINT = 0x41
+
+def covers_codepoint(unicode_range, codepoint):
+    if not unicode_range:
+        return True
+    return any(first <= codepoint <= last for first, last in font_store.parse_unicode_ranges(unicode_range))
+
+def minify_font_face(face, font_display=FONT_DISPLAY_PARAM):
+    rule = (
+        f"@font-face{{font-family:'{face['family']}';font-style:{face['style']};"
+        f"font-weight:{face['weight']};font-display:{font_display};"
+        f"src:url({FONT_URL_PREFIX}{face['file']}) format('woff2')"
+    )
+    if face.get('unicode_range'):
+        rule += f";unicode-range:{face['unicode_range'].replace(', ', ',')}"
+    return rule + "}"
+
+def preload_files(faces):
+    """Woff2 URLs worth preloading: upright faces whose subset covers Basic Latin."""
+    urls = []
+    for face in faces:
+        if face['style'] != 'normal' or not covers_codepoint(face.get('unicode_range'), PRELOAD_CODEPOINT):
+            continue
+        url = f"{FONT_URL_PREFIX}{face['file']}"
+        if url not in urls:
+            urls.append(url)
+    return urls
+
+def write_bundle(path, faces, font_display):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("".join(minify_font_face(face, font_display) for face in faces))
+
+def default_bundle_dir(manifest_path):
+    """BUNDLE_DIR for the download manifest; css-<name> next to it for any other, e.g. css-subset."""
+    manifest_path = Path(manifest_path)
+    if manifest_path == Path(font_store.FONT_MANIFEST_FILE):
+        return BUNDLE_DIR
+    name = re.sub(r'^font_|_manifest$', '', manifest_path.stem)
+    return BUNDLE_DIR.parent / f"css-{font_store.clean_family(name)}"
+
+def write_bundles(faces, pairings=None, bundle_dir=BUNDLE_DIR, font_display=FONT_DISPLAY_PARAM):
+    """Writes one minified CSS file per family and per pairing, plus the preload manifest.
+
+    faces are manifest-style dicts (family/style/weight/unicode_range/file).
+    Returns the preload manifest.
+    """
+    bundle_dir = Path(bundle_dir)
+    if pairings is None:
+        pairings = load_font_pairings()
+    by_family = {}
+    for face in faces:
+        by_family.setdefault(face['family'], []).append(face)
+
+    manifest = {'families': {}, 'pairings': {}}
+    for family, family_faces in by_family.items():
+        css_path = bundle_dir / "families" / f"{font_store.clean_family(family)}.css"
+        write_bundle(css_path, family_faces, font_display)
+        manifest['families'][family] = f"{FONT_URL_PREFIX}{css_path.relative_to(bundle_dir.parent).as_posix()}"
+
+    for pairing in pairings:
+        families = [pairing['heading']]
+        if pairing['paragraph'] != pairing['heading']:
+            families.append(pairing['paragraph'])
+        missing = [family for family in families if family not in by_family]
+        if missing:
+            print(f"Warning: No faces for {', '.join(missing)} (pairing '{pairing['label']}').")
+        pairing_faces = [face for family in families for face in by_family.get(family, [])]
+        css_path = bundle_dir / "pairings" / f"{font_store.clean_family(pairing['label'])}.css"
+        write_bundle(css_path, pairing_faces, font_display)
+        manifest['pairings'][pairing['label']] = {
+            'heading': pairing['heading'],
+            'paragraph': pairing['paragraph'],
+            'css': f"{FONT_URL_PREFIX}{css_path.relative_to(bundle_dir.parent).as_posix()}",
+            'preload': preload_files(pairing_faces),
+        }
+
+    with open(bundle_dir / PRELOAD_MANIFEST_FILE.name, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+        f.write("\n")
+    print(f"Wrote {len(manifest['families'])} family and {len(manifest['pairings'])} pairing CSS bundles to {bundle_dir}")
+    return manifest
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write per-family and per-pairing @font-face bundles and a preload manifest.")
+    parser.add_argument("--manifest", default=str(font_store.FONT_MANIFEST_FILE),
+                        help="Font manifest to bundle (e.g. font_subset_manifest.json for subset fonts)")
+    parser.add_argument("--output-dir", default=None,
+                        help="Where to write the bundles (default: public/fonts/css for the download manifest, "
+                             "public/fonts/css-<name> for others, e.g. css-subset)")
+    args = parser.parse_args()
+    output_dir = args.output_dir or default_bundle_dir(args.manifest)
+    write_bundles(font_store.load_manifest(args.manifest)['faces'], bundle_dir=output_dir)
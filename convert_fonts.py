@@ -0,0 +1,153 @@
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import font_store
+from download_fonts import format_font_face
+from font_metadata import read_font_directory
+
+# Bundled TTF/OTF/WOFF files are recompressed to woff2 into the content-addressed store
+SOURCE_EXTENSIONS = ('.ttf', '.otf', '.woff')
+CONVERTED_MANIFEST_FILE = Path("font_converted_manifest.json")
+CONVERTED_CSS_FILE = Path("generated_font_faces_converted.css")
+# Source stat/hash -> store entry of the last conversion, so unchanged sources are skipped
+CONVERT_STATE_FILE = Path(".font_cache/convert_state.json")
+
+# Used when a font's OS/2 weight is not a CSS step (Inter's Thin and ExtraLight are both 250)
+NAMED_WEIGHTS = [
+    ('extralight', 200), ('ultralight', 200), ('semibold', 600), ('demibold', 600),
+    ('extrabold', 800), ('ultrabold', 800), ('thin', 100), ('hairline', 100), ('light', 300),
+    ('regular', 400), ('book', 400), ('medium', 500), ('bold', 700), ('black', 900), ('heavy', 900),
+]
+
+def css_weight(meta):
+    weight = str(meta['weight'])
+    if meta['variable'] or int(weight) % 100 == 0:
+        return weight
+    subfamily = (meta.get('subfamily') or "").lower().replace(" ", "").replace("-", "")
+    for name, value in NAMED_WEIGHTS:
+        if name in subfamily:
+            return str(value)
+    return weight
+
+def convert_font_file(source_path):
+    """Recompresses one font to woff2 bytes. Runs in a worker process."""
+    import io
+    from fontTools.ttLib import TTFont
+
+    font = TTFont(source_path)
+    font.flavor = "woff2"
+    buffer = io.BytesIO()
+    font.save(buffer)
+    return buffer.getvalue()
+
+def load_convert_state():
+    try:
+        with open(CONVERT_STATE_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_convert_state(state):
+    CONVERT_STATE_FILE.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = Path(f"{CONVERT_STATE_FILE}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, CONVERT_STATE_FILE)
+
+def unchanged_entry(font_dir, fname, previous):
+    """The previous store entry if the source still has the same bytes and the output is on disk."""
+    if not previous or not (Path(font_dir) / previous['entry']['file']).exists():
+        return None
+    st = os.stat(Path(font_dir) / fname)
+    if previous['stat'] == [st.st_mtime_ns, st.st_size]:
+        return previous['entry']
+    # Touched but maybe not modified: compare content before reconverting
+    if font_store.hash_file(Path(font_dir) / fname) == previous['source_sha256']:
+        previous['stat'] = [st.st_mtime_ns, st.st_size]
+        return previous['entry']
+    return None
+
+def convert_fonts(font_dir=font_store.FONT_STORE_DIR, max_workers=None):
+    try:
+        import fontTools  # noqa: F401
+    except ImportError:
+        print("Error: fontTools is required for woff2 conversion (pip install fonttools brotli).", file=sys.stderr)
+        sys.exit(1)
+
+    font_dir = Path(font_dir)
+    sources = sorted(
+        fname for fname in os.listdir(font_dir)
+        if fname.lower().endswith(SOURCE_EXTENSIONS) and not font_store.is_store_name(fname)
+    )
+    if not sources:
+        print(f"No TTF/OTF/WOFF files to convert in {font_dir}.")
+        return
+    metadata = read_font_directory(font_dir, max_workers=max_workers, filenames=sources)
+    previous_state = load_convert_state()
+    state = {}
+    entries = {}
+    jobs = []
+    for fname in sources:
+        if fname not in metadata or not metadata[fname]['family']:
+            print(f"Warning: Could not read the font identity of {fname}. Skipping.")
+            continue
+        entry = unchanged_entry(font_dir, fname, previous_state.get(fname))
+        if entry:
+            entries[fname] = entry
+            state[fname] = previous_state[fname]
+        else:
+            jobs.append(fname)
+
+    print(f"Converting {len(jobs)} of {len(sources)} fonts to woff2 ({len(sources) - len(jobs)} unchanged)...")
+    if jobs:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = {fname: executor.submit(convert_font_file, str(font_dir / fname)) for fname in jobs}
+            for fname, future in futures.items():
+                try:
+                    data = future.result()
+                except Exception as e:
+                    print(f"  Error converting {fname}: {e}")
+                    continue
+                entry = font_store.store_font_bytes(data, ".woff2", font_dir)
+                st = os.stat(font_dir / fname)
+                entries[fname] = entry
+                state[fname] = {
+                    'stat': [st.st_mtime_ns, st.st_size],
+                    'source_sha256': font_store.hash_file(font_dir / fname),
+                    'entry': entry,
+                }
+                print(f"  {fname}: {st.st_size / 1024:.0f} KB -> {entry['size'] / 1024:.0f} KB")
+
+    faces = []
+    for fname in sources:
+        if fname not in entries:
+            continue
+        meta = metadata[fname]
+        faces.append(dict(
+            entries[fname],
+            family=meta['family'],
+            style=meta['style'],
+            weight=css_weight(meta),
+            unicode_range=None,
+            url=f"/fonts/{fname}",
+        ))
+    font_store.save_manifest(faces, CONVERTED_MANIFEST_FILE)
+    with open(CONVERTED_CSS_FILE, "w", encoding="utf-8") as f:
+        for face in faces:
+            f.write(format_font_face(face))
+    save_convert_state(state)
+
+    source_bytes = sum(os.path.getsize(font_dir / fname) for fname in entries)
+    converted_bytes = sum(entry['size'] for entry in entries.values())
+    print(f"{len(faces)} fonts as woff2: {source_bytes / 1024:.0f} KB -> {converted_bytes / 1024:.0f} KB.")
+    print(f"CSS written to {CONVERTED_CSS_FILE}, manifest to {CONVERTED_MANIFEST_FILE}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recompress bundled TTF/OTF/WOFF fonts to woff2 and emit @font-face rules.")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    args = parser.parse_args()
+    convert_fonts(max_workers=args.workers)
@@ -1,8 +1,18 @@
 import requests
 import re
 import os
+import json
+import time
+import hashlib
+import argparse
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import urllib.parse
+from requests.adapters import HTTPAdapter
+import font_store
+import run_metrics
+from font_metadata import weight_bounds
+from bundle_font_css import write_bundles
 
 # List of font families from FONT_PAIRINGS (deduplicated, Bebas corrected to Bebas Neue)
 FONT_FAMILIES = sorted(list(set([
@@ -25,101 +35,437 @@ AXES_QUERIES = [
 FONT_DISPLAY_PARAM = "swap"  # Or "block"
 
 OUTPUT_FONT_DIR = Path("public/fonts")
+# Endpoints are overridable so the pipeline can run against a local stand-in (fake_google_fonts_server.py)
+FONTS_CSS_URL = os.environ.get("GOOGLE_FONTS_CSS_URL", "https://fonts.googleapis.com/css2")
+FONTS_STATIC_URL = os.environ.get("GOOGLE_FONTS_STATIC_URL", "https://fonts.gstatic.com").rstrip("/")
+FONT_SRC_RE = re.compile(r"src:\s*url\((" + re.escape(FONTS_STATIC_URL) + r"/s/.*?\.woff2)\)", re.IGNORECASE)
 USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
 
-def sanitize_filename(name):
-    return re.sub(r'[^a-z0-9_.-]+', '-', name.lower())
+# Number of CSS/woff2 requests in flight at once (1 = fetch everything sequentially)
+MAX_WORKERS = 8
 
-def fetch_font_css(session, family_name):
-    for axes in AXES_QUERIES:
+# On-disk cache of CSS2 responses, revalidated with ETag/Last-Modified once older than the TTL
+CSS_CACHE_DIR = Path(".font_cache/css")
+CSS_CACHE_TTL = 7 * 24 * 60 * 60  # seconds
+# Remembers which AXES_QUERIES entry worked for each family so it is tried first next time
+AXES_MEMORY_FILE = Path(".font_cache/axes.json")
+# Interrupted downloads are kept here and resumed with a Range request
+PARTIAL_DIR = Path(".font_cache/partial")
+DOWNLOAD_CHUNK_SIZE = 16 * 1024  # bytes; smaller chunks leave more to resume after a dropped connection
+CONTENT_RANGE_RE = re.compile(r'^bytes (?:\d+-\d+|\*)/(\d+)$')
+
+def create_session(max_workers=MAX_WORKERS):
+    # One pooled keep-alive session shared by all workers
+    session = requests.Session()
+    session.headers.update({"User-Agent": USER_AGENT})
+    adapter = HTTPAdapter(pool_connections=2, pool_maxsize=max(max_workers, 1))
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+def _css_cache_path(url):
+    return CSS_CACHE_DIR / f"{hashlib.sha256(url.encode('utf-8')).hexdigest()}.json"
+
+def load_css_cache_entry(url):
+    try:
+        with open(_css_cache_path(url), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def save_css_cache_entry(url, entry):
+    CSS_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    path = _css_cache_path(url)
+    tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(entry, f)
+    os.replace(tmp_path, path)
+
+def fetch_css_cached(session, url, use_cache=True, refresh=False):
+    """GETs a CSS2 URL through the on-disk cache.
+
+    Fresh entries (younger than CSS_CACHE_TTL) are returned without a request; stale ones are
+    revalidated with If-None-Match/If-Modified-Since. Raises RequestException on failure.
+    """
+    entry = load_css_cache_entry(url) if use_cache else None
+    if entry and not refresh and time.time() - entry.get('fetched_at', 0) < CSS_CACHE_TTL:
+        run_metrics.inc("font_css_cache_total", result="hit")
+        return entry['body']
+    headers = {}
+    if entry:
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+    started = time.perf_counter()
+    try:
+        response = session.get(url, headers=headers)
+    except requests.exceptions.RequestException:
+        run_metrics.observe("font_css_request_seconds", time.perf_counter() - started, status="error")
+        raise
+    run_metrics.observe("font_css_request_seconds", time.perf_counter() - started, status=response.status_code)
+    run_metrics.inc("font_bytes_received_total", len(response.content), kind="css")
+    if entry and response.status_code == 304:
+        run_metrics.inc("font_css_cache_total", result="revalidated")
+        entry['fetched_at'] = time.time()
+        save_css_cache_entry(url, entry)
+        return entry['body']
+    response.raise_for_status()
+    run_metrics.inc("font_css_cache_total", result="miss")
+    if use_cache:
+        save_css_cache_entry(url, {
+            'url': url,
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'fetched_at': time.time(),
+            'body': response.text,
+        })
+    return response.text
+
+def load_axes_memory():
+    try:
+        with open(AXES_MEMORY_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_axes_memory(axes_memory):
+    AXES_MEMORY_FILE.parent.mkdir(parents=True, exist_ok=True)
+    with open(AXES_MEMORY_FILE, "w", encoding="utf-8") as f:
+        json.dump(axes_memory, f, indent=2, sort_keys=True)
+
+def fetch_font_css(session, family_name, axes_memory=None, use_cache=True, refresh=False):
+    # Try the axes query that worked last time first, then fall back to the usual order
+    axes_queries = list(AXES_QUERIES)
+    remembered_axes = axes_memory.get(family_name) if axes_memory is not None else None
+    if remembered_axes in axes_queries:
+        axes_queries.remove(remembered_axes)
+        axes_queries.insert(0, remembered_axes)
+    for axes in axes_queries:
         encoded_family_name = urllib.parse.quote_plus(family_name)
         if axes:
-            font_api_url = f"https://fonts.googleapis.com/css2?family={encoded_family_name}:{axes}&display={FONT_DISPLAY_PARAM}"
+            font_api_url = f"{FONTS_CSS_URL}?family={encoded_family_name}:{axes}&display={FONT_DISPLAY_PARAM}"
         else:
-            font_api_url = f"https://fonts.googleapis.com/css2?family={encoded_family_name}&display={FONT_DISPLAY_PARAM}"
+            font_api_url = f"{FONTS_CSS_URL}?family={encoded_family_name}&display={FONT_DISPLAY_PARAM}"
         try:
-            response = session.get(font_api_url)
-            response.raise_for_status()
-            return response.text, axes
+            css_content = fetch_css_cached(session, font_api_url, use_cache=use_cache, refresh=refresh)
+            if axes_memory is not None:
+                axes_memory[family_name] = axes
+            return css_content, axes
         except requests.exceptions.RequestException as e:
+            run_metrics.inc("font_css_axes_failures_total", axes=axes or "none")
             # Only print error for the last attempt
-            if axes == AXES_QUERIES[-1]:
+            if axes == axes_queries[-1]:
                 print(f"  Error fetching CSS for {family_name}: {e}")
     return None, None
 
-def download_fonts():
+def parse_font_faces(family_name, css_content):
+    """Parses the @font-face blocks of a CSS2 response into face dicts, in document order."""
+    faces = []
+    font_face_blocks = re.findall(r"(@font-face\s*\{.+?\})", css_content, re.DOTALL)
+    if not font_face_blocks:
+        print(f"  No @font-face blocks found for {family_name}. Skipping.")
+        return faces
+    for block in font_face_blocks:
+        ff_match = re.search(r"font-family:\s*['\"](.+?)['\"]", block, re.IGNORECASE)
+        fs_match = re.search(r"font-style:\s*(\w+)", block, re.IGNORECASE)
+        fw_match = re.search(r"font-weight:\s*(\d+)(?:\s+(\d+))?", block, re.IGNORECASE)
+        src_match = FONT_SRC_RE.search(block)
+        ur_match = re.search(r"unicode-range:\s*(.+?);", block, re.IGNORECASE)
+        if not (ff_match and fs_match and fw_match and src_match):
+            print(f"  Could not parse all required fields from a @font-face block for {family_name}. Skipping block.")
+            continue
+        actual_family = ff_match.group(1)
+        style = fs_match.group(1)
+        # Variable families queried with a range come back as e.g. "font-weight: 100 900"
+        weight = " ".join(group for group in fw_match.groups() if group)
+        woff2_url = src_match.group(1)
+        unicode_range = ur_match.group(1) if ur_match else None
+        faces.append({
+            'family': actual_family,
+            'style': style,
+            'weight': weight,
+            'url': woff2_url,
+            'unicode_range': unicode_range,
+        })
+    return faces
+
+def consolidate_variable_faces(faces):
+    """Collapses faces that share one variable file into a single weight-range face.
+
+    Blocks with the same family, style, unicode-range and woff2 URL but different
+    weights describe one variable font, so they become one rule with a
+    "font-weight: <min> <max>" range. Exact duplicates are dropped. Order follows
+    the first occurrence of each file.
+    """
+    merged = {}
+    bounds = {}
+    for face in faces:
+        key = (face['family'], face['style'], face['unicode_range'], face['url'])
+        low, high = weight_bounds(face['weight'])
+        if key in merged:
+            old_low, old_high = bounds[key]
+            bounds[key] = (min(low, old_low), max(high, old_high))
+        else:
+            merged[key] = dict(face)
+            bounds[key] = (low, high)
+    for key, face in merged.items():
+        low, high = bounds[key]
+        face['weight'] = str(low) if low == high else f"{low} {high}"
+    return list(merged.values())
+
+def _partial_paths(woff2_url):
+    name = hashlib.sha256(woff2_url.encode('utf-8')).hexdigest()
+    return PARTIAL_DIR / f"{name}.part", PARTIAL_DIR / f"{name}.json"
+
+def _discard_partial(part_path, meta_path):
+    for path in (part_path, meta_path):
+        if path.exists():
+            os.remove(path)
+
+def _load_partial_meta(meta_path):
+    try:
+        with open(meta_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _content_range_total(content_range):
+    match = CONTENT_RANGE_RE.match(content_range or "")
+    return int(match.group(1)) if match else None
+
+def _store_partial(woff2_url, part_path, meta_path, digest=None):
+    """Checks a fully received partial file and moves it into the store; returns the entry or None."""
+    size = part_path.stat().st_size
+    problem = font_store.check_font_header(part_path, ".woff2", size)
+    if problem:
+        print(f"    Corrupt download of {woff2_url}: {problem}")
+        run_metrics.inc("font_download_failures_total", reason="corrupt")
+        _discard_partial(part_path, meta_path)
+        return None
+    entry = font_store.store_font_file(part_path, digest or font_store.hash_file(part_path), ".woff2", OUTPUT_FONT_DIR)
+    _discard_partial(part_path, meta_path)
+    return entry
+
+def _store_complete_partial(session, woff2_url, part_path, meta_path):
+    # Every byte arrived in an earlier run, which stopped before storing the file
+    print(f"    Finishing {woff2_url} from the complete partial download")
+    entry = _store_partial(woff2_url, part_path, meta_path)
+    # A corrupt partial has been discarded, so this refetches from scratch
+    return entry or download_font_file(session, woff2_url)
+
+def download_font_file(session, woff2_url):
+    """Streams a single woff2 file into the content-addressed store.
+
+    The body is written in chunks to a partial file under PARTIAL_DIR. If a
+    previous run was interrupted, the download resumes with a Range request
+    (guarded by If-Range on the saved validator). A partial file that is
+    already complete is stored without a request, or after the server answers
+    416 for the resume. Before the file is moved into the store, its length,
+    woff2 signature and declared length are checked. Returns the store entry
+    (sha256, size, file), or None on failure.
+    """
+    PARTIAL_DIR.mkdir(parents=True, exist_ok=True)
+    part_path, meta_path = _partial_paths(woff2_url)
+    offset = part_path.stat().st_size if part_path.exists() else 0
+    meta = _load_partial_meta(meta_path) if offset else {}
+    validator = meta.get('validator')
+    if offset and offset == meta.get('size'):
+        return _store_complete_partial(session, woff2_url, part_path, meta_path)
+    headers = {'Accept-Encoding': "identity"}
+    if offset and validator:
+        headers['Range'] = f"bytes={offset}-"
+        headers['If-Range'] = validator
+
+    digest = hashlib.sha256()
+    started = time.perf_counter()
+    received = 0
+    try:
+        with session.get(woff2_url, headers=headers, stream=True) as font_response:
+            font_response.raise_for_status()
+            if font_response.status_code == 206 and 'Range' in headers:
+                # Resume: the bytes already on disk are part of the hash too
+                with open(part_path, "rb") as f:
+                    for chunk in iter(lambda: f.read(DOWNLOAD_CHUNK_SIZE), b""):
+                        digest.update(chunk)
+                mode = "ab"
+                run_metrics.inc("font_download_resumed_total")
+                print(f"    Resuming {woff2_url} at byte {offset}")
+            else:
+                offset = 0
+                mode = "wb"
+            validator = font_response.headers.get('ETag') or font_response.headers.get('Last-Modified')
+            content_length = font_response.headers.get('Content-Length')
+            expected_size = offset + int(content_length) if content_length else None
+            if font_response.status_code == 206:
+                expected_size = _content_range_total(font_response.headers.get('Content-Range')) or expected_size
+            with open(meta_path, "w", encoding="utf-8") as f:
+                json.dump({'url': woff2_url, 'validator': validator, 'size': expected_size}, f)
+            with open(part_path, mode) as f:
+                for chunk in font_response.iter_content(DOWNLOAD_CHUNK_SIZE):
+                    f.write(chunk)
+                    digest.update(chunk)
+                    received += len(chunk)
+    except requests.exceptions.RequestException as e:
+        if e.response is not None and e.response.status_code == 416 and 'Range' in headers:
+            # Nothing left to send from offset: the partial is complete, or the file has changed
+            if _content_range_total(e.response.headers.get('Content-Range')) == offset:
+                return _store_complete_partial(session, woff2_url, part_path, meta_path)
+            print(f"    Cannot resume {woff2_url} at byte {offset}; downloading again")
+            _discard_partial(part_path, meta_path)
+            return download_font_file(session, woff2_url)
+        # The partial file is kept so the next run can resume it
+        run_metrics.observe("font_download_seconds", time.perf_counter() - started, result="error")
+        run_metrics.inc("font_bytes_received_total", received, kind="woff2")
+        run_metrics.inc("font_download_failures_total", reason="request")
+        print(f"    Error downloading {woff2_url}: {e}")
+        return None
+    run_metrics.observe("font_download_seconds", time.perf_counter() - started, result="ok")
+    run_metrics.inc("font_bytes_received_total", received, kind="woff2")
+
+    size = part_path.stat().st_size
+    if expected_size is not None and size != expected_size:
+        print(f"    Incomplete download of {woff2_url}: {size} of {expected_size} bytes; will resume next run")
+        run_metrics.inc("font_download_failures_total", reason="incomplete")
+        return None
+    return _store_partial(woff2_url, part_path, meta_path, digest.hexdigest())
+
+def verify_stored_fonts(executor, stored, urls, check_hash=False):
+    """Re-checks the stored files reused for urls in parallel; corrupt ones are deleted and forgotten.
+
+    Only size and header are checked unless check_hash is set; build_fonts.py's verify
+    stage hashes the whole store.
+    """
+    checks = {
+        url: executor.submit(font_store.verify_store_entry, stored[url], OUTPUT_FONT_DIR, check_hash)
+        for url in urls if url in stored
+    }
+    for url, future in checks.items():
+        problem = future.result()
+        if problem:
+            entry = stored.pop(url)
+            run_metrics.inc("font_store_corrupt_total")
+            print(f"  Corrupt: {entry['file']} ({problem}); downloading again")
+            path = OUTPUT_FONT_DIR / entry['file']
+            if path.exists():
+                os.remove(path)
+
+def format_font_face(face):
+    css_rule = "@font-face {\n"
+    css_rule += f"  font-family: '{face['family']}';\n"
+    css_rule += f"  font-style: {face['style']};\n"
+    css_rule += f"  font-weight: {face['weight']};\n"
+    css_rule += f"  font-display: {FONT_DISPLAY_PARAM};\n"
+    css_rule += f"  src: url('/fonts/{face['file']}') format('woff2');\n"
+    if face['unicode_range']:
+        css_rule += f"  unicode-range: {face['unicode_range']};\n"
+    css_rule += "}\n"
+    return css_rule
+
+def download_fonts(max_workers=MAX_WORKERS, use_cache=True, refresh_css=False, print_css=False, families=None, verify=False):
+    # families limits which FONT_FAMILIES are refetched; the others are carried over from the manifest
+    fetch_families = FONT_FAMILIES if families is None else [f for f in FONT_FAMILIES if f in families]
+    previous_manifest = font_store.load_manifest()
     OUTPUT_FONT_DIR.mkdir(parents=True, exist_ok=True)
     print(f"Font files will be saved to: {OUTPUT_FONT_DIR.resolve()}")
-    all_css_rules = []
-    session = requests.Session()
-    session.headers.update({"User-Agent": USER_AGENT})
+    print(f"Using up to {max_workers} concurrent requests.")
+    session = create_session(max_workers)
+    axes_memory = load_axes_memory() if use_cache else None
 
-    for family_name in FONT_FAMILIES:
-        print(f"\nProcessing font family: {family_name}")
-        css_content, used_axes = fetch_font_css(session, family_name)
-        if not css_content:
-            print(f"  All attempts failed for {family_name}. Skipping.")
-            continue
-        font_face_blocks = re.findall(r"(@font-face\s*\{.+?\})", css_content, re.DOTALL)
-        if not font_face_blocks:
-            print(f"  No @font-face blocks found for {family_name}. Skipping.")
-            continue
-        for block in font_face_blocks:
-            ff_match = re.search(r"font-family:\s*['\"](.+?)['\"]", block, re.IGNORECASE)
-            fs_match = re.search(r"font-style:\s*(\w+)", block, re.IGNORECASE)
-            fw_match = re.search(r"font-weight:\s*(\d+)", block, re.IGNORECASE)
-            src_match = re.search(r"src:\s*url\((https://fonts.gstatic.com/s/.*?\.woff2)\)", block, re.IGNORECASE)
-            ur_match = re.search(r"unicode-range:\s*(.+?);", block, re.IGNORECASE)
-            if not (ff_match and fs_match and fw_match and src_match):
-                print(f"  Could not parse all required fields from a @font-face block for {family_name}. Skipping block.")
-                continue
-            actual_family = ff_match.group(1)
-            style = fs_match.group(1)
-            weight = fw_match.group(1)
-            woff2_url = src_match.group(1)
-            unicode_range = ur_match.group(1) if ur_match else None
-            local_file_name_base = sanitize_filename(f"{actual_family}-{style}-{weight}")
-            url_path_parts = Path(urllib.parse.urlparse(woff2_url).path).name
-            potential_unique_part = Path(url_path_parts).stem
-            if len(potential_unique_part) > 10 and potential_unique_part.isalnum():
-                 local_file_name = f"{sanitize_filename(actual_family)}-{potential_unique_part}.woff2"
-            else:
-                 local_file_name = f"{local_file_name_base}.woff2"
-            font_file_path = OUTPUT_FONT_DIR / local_file_name
-            if not font_file_path.exists():
-                try:
-                    print(f"  Downloading: {actual_family} {style} {weight} -> {local_file_name}")
-                    font_response = session.get(woff2_url)
-                    font_response.raise_for_status()
-                    with open(font_file_path, "wb") as f:
-                        f.write(font_response.content)
-                except requests.exceptions.RequestException as e:
-                    print(f"    Error downloading {woff2_url}: {e}")
+    with ThreadPoolExecutor(max_workers=max(max_workers, 1)) as executor:
+        # 1. Fetch the CSS for every family in parallel; map() keeps FONT_FAMILIES order
+        with run_metrics.stage("css"):
+            css_results = list(executor.map(
+                lambda family: fetch_font_css(session, family, axes_memory, use_cache, refresh_css),
+                fetch_families
+            ))
+            if axes_memory is not None:
+                save_axes_memory(axes_memory)
+
+        with run_metrics.stage("parse"), run_metrics.profile("parse"):
+            faces_by_family = {}
+            block_count = 0
+            for family_name, (css_content, used_axes) in zip(fetch_families, css_results):
+                print(f"\nProcessing font family: {family_name}")
+                if not css_content:
+                    print(f"  All attempts failed for {family_name}. Skipping.")
                     continue
-            else:
-                print(f"  Exists: {local_file_name}")
-            css_rule = "@font-face {\n"
-            css_rule += f"  font-family: '{actual_family}';\n"
-            css_rule += f"  font-style: {style};\n"
-            css_rule += f"  font-weight: {weight};\n"
-            css_rule += f"  font-display: {FONT_DISPLAY_PARAM};\n"
-            css_rule += f"  src: url('/fonts/{local_file_name}') format('woff2');\n"
-            if unicode_range:
-                css_rule += f"  unicode-range: {unicode_range};\n"
-            css_rule += "}\n"
-            all_css_rules.append(css_rule)
-    if all_css_rules:
-        print("\n\n--- Generated CSS @font-face rules ---")
-        print("--- Copy the rules below into your styles/globals.css file ---")
-        for rule in all_css_rules:
-            print(rule)
-        css_output_file = Path("generated_font_faces.css")
-        with open(css_output_file, "w", encoding="utf-8") as f:
-            for rule in all_css_rules:
-                f.write(rule)
-        print(f"\n--- CSS rules also saved to: {css_output_file.resolve()} ---")
-    else:
-        print("\nNo CSS rules generated. Check for errors above.")
+                family_faces = parse_font_faces(family_name, css_content)
+                block_count += len(family_faces)
+                faces_by_family[family_name] = consolidate_variable_faces(family_faces)
+            faces = [face for family_faces in faces_by_family.values() for face in family_faces]
+            if len(faces) < block_count:
+                print(f"\nConsolidated {block_count} @font-face blocks into {len(faces)} (variable fonts and duplicates).")
+
+        # 2. Download every distinct URL not already in the store, in parallel
+        with run_metrics.stage("verify"):
+            stored = font_store.manifest_url_index(previous_manifest, OUTPUT_FONT_DIR)
+            verify_stored_fonts(executor, stored, {face['url'] for face in faces}, check_hash=verify)
+        with run_metrics.stage("download"):
+            downloads = {}
+            for face in faces:
+                if face['url'] in downloads:
+                    continue
+                if face['url'] in stored:
+                    print(f"  Exists: {stored[face['url']]['file']}")
+                    continue
+                print(f"  Downloading: {face['family']} {face['style']} {face['weight']} -> {face['url']}")
+                downloads[face['url']] = executor.submit(download_font_file, session, face['url'])
+            for url, future in downloads.items():
+                entry = future.result()
+                if entry:
+                    stored[url] = entry
+
+    # 3. Emit the rules and manifest in the original family/block order, skipping failed downloads
+    with run_metrics.stage("write"), run_metrics.profile("write"):
+        stored_faces = []
+        for family_name in FONT_FAMILIES:
+            if family_name in faces_by_family:
+                stored_faces.extend(
+                    dict(face, **stored[face['url']]) for face in faces_by_family[family_name] if face['url'] in stored
+                )
+            elif family_name not in fetch_families:
+                stored_faces.extend(face for face in previous_manifest['faces'] if face['family'] == family_name)
+        if stored_faces:
+            font_store.save_manifest(stored_faces)
+            unique_files = len({face['sha256'] for face in stored_faces})
+            print(f"\n{len(stored_faces)} faces stored as {unique_files} unique files; manifest: {font_store.FONT_MANIFEST_FILE.resolve()}")
+        all_css_rules = [format_font_face(face) for face in stored_faces]
+        if all_css_rules:
+            if print_css:
+                print("\n\n--- Generated CSS @font-face rules ---")
+                print("--- Copy the rules below into your styles/globals.css file ---")
+                for rule in all_css_rules:
+                    print(rule)
+            css_output_file = Path("generated_font_faces.css")
+            with open(css_output_file, "w", encoding="utf-8") as f:
+                for rule in all_css_rules:
+                    f.write(rule)
+            print(f"\n--- CSS rules saved to: {css_output_file.resolve()} ---")
+            # Per-family/per-pairing bundles so pages only load the fonts they render
+            write_bundles(stored_faces, font_display=FONT_DISPLAY_PARAM)
+        else:
+            print("\nNo CSS rules generated. Check for errors above.")
 
 if __name__ == "__main__":
-    download_fonts() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Download Google Fonts woff2 files and generate @font-face rules.")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS,
+                        help=f"Maximum concurrent requests (default: {MAX_WORKERS}; 1 runs sequentially)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Bypass the on-disk CSS cache and axes memory")
+    parser.add_argument("--refresh-css", action="store_true",
+                        help="Revalidate cached CSS even if it is younger than the TTL")
+    parser.add_argument("--family", action="append", dest="families",
+                        help="Only refetch this family (repeatable); the rest are kept from the manifest")
+    parser.add_argument("--print-css", action="store_true",
+                        help="Also print every generated @font-face rule to stdout")
+    parser.add_argument("--verify", action="store_true",
+                        help="Also check the SHA-256 of every reused stored font, not just its size and header")
+    parser.add_argument("--profile", action="store_true",
+                        help="Capture cProfile data for the parse and write loops in the metrics report")
+    args = parser.parse_args()
+    if args.profile:
+        run_metrics.enable_profiling()
+    run_metrics.write_report_at_exit("download_fonts")
+    download_fonts(max_workers=args.workers, use_cache=not args.no_cache, refresh_css=args.refresh_css,
+                   print_css=args.print_css, families=args.families, verify=args.verify)
@@ -0,0 +1,284 @@
+import argparse
+import hashlib
+import json
+import random
+import re
+import struct
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from pathlib import Path
+from urllib.parse import urlparse, parse_qs
+
+# Local stand-in for fonts.googleapis.com/css2 and fonts.gstatic.com, so download_fonts.py can
+# be run and measured without network access. Point it here with
+#   GOOGLE_FONTS_CSS_URL=<base>/css2 GOOGLE_FONTS_STATIC_URL=<base>
+# Responses are either synthesized (deterministic per family) or replayed from a fixture
+# directory captured with --record.
+
+# Subsets in the order Google lists them; latin is always last
+SUBSETS = [
+    ("cyrillic-ext", "U+0460-052F, U+1C80-1C88, U+20B4, U+2DE0-2DFF, U+A640-A69F, U+FE2E-FE2F"),
+    ("cyrillic", "U+0301, U+0400-045F, U+0490-0491, U+04B0-04B1, U+2116"),
+    ("greek", "U+0370-0377, U+037A-037F, U+0384-038A, U+038C, U+038E-03A1, U+03A3-03FF"),
+    ("vietnamese", "U+0102-0103, U+0110-0111, U+0128-0129, U+0168-0169, U+01A0-01A1, U+01AF-01B0, U+0300-0301, U+0303-0304, U+0308-0309, U+0323, U+0329, U+1EA0-1EF9, U+20AB"),
+    ("latin-ext", "U+0100-02AF, U+0304, U+0308, U+0329, U+1E00-1E9F, U+1EF2-1EFF, U+2020, U+20A0-20AB, U+20AD-20C0, U+2113, U+2C60-2C7F, U+A720-A7FF"),
+    ("latin", "U+0000-00FF, U+0131, U+0152-0153, U+02BB-02BC, U+02C6, U+02DA, U+02DC, U+0304, U+0308, U+0329, U+2000-206F, U+2074, U+20AC, U+2122, U+2191, U+2193, U+2212, U+2215, U+FEFF, U+FFFD"),
+]
+FIXTURE_INDEX = "index.json"
+STATIC_PLACEHOLDER = "{STATIC_URL}"
+RANGE_RE = re.compile(r'^bytes=(\d+)-$')
+
+def family_profile(family):
+    """Deterministic made-up metadata for a family: variable or static, italics, subsets."""
+    rng = random.Random(hashlib.sha256(family.encode('utf-8')).digest())
+    variable = rng.random() < 0.6
+    return {
+        'variable': variable,
+        'italic': rng.random() < 0.5,
+        'weights': [100, 200, 300, 400, 500, 600, 700, 800, 900] if variable else sorted(rng.sample([300, 400, 700, 900], 2) + [400]),
+        'subsets': SUBSETS[-rng.randint(1, len(SUBSETS)):],
+    }
+
+def font_bytes(path):
+    """Deterministic woff2-shaped payload (signature, flavor, length header) for a file path."""
+    rng = random.Random(hashlib.sha256(path.encode('utf-8')).digest())
+    size = rng.randint(8 * 1024, 48 * 1024)
+    header = b'wOF2' + b'\x00\x01\x00\x00' + struct.pack(">I", size)
+    return header + rng.randbytes(size - len(header))
+
+def parse_axes(spec):
+    """Splits e.g. "ital,wght@0,100..900;1,100..900" into [(italic, weights)] tuples.
+
+    weights is a (low, high) range or a single int. An empty spec means regular 400.
+    """
+    if not spec:
+        return [(0, 400)]
+    axes, _, tuples = spec.partition("@")
+    names = axes.split(",")
+    result = []
+    for values in tuples.split(";"):
+        fields = dict(zip(names, values.split(",")))
+        weight = fields.get('wght', "400")
+        if ".." in weight:
+            low, high = weight.split("..")
+            weight = (int(low), int(high))
+        else:
+            weight = int(weight)
+        result.append((int(fields.get('ital', 0)), weight))
+    return result
+
+def synthesize_css(family, spec, display):
+    """Returns (status, body) the way the CSS2 API would answer for a synthesized family."""
+    profile = family_profile(family)
+    try:
+        requested = parse_axes(spec)
+    except ValueError:
+        return 400, "Invalid selector"
+    slug = family.lower().replace(" ", "")
+    blocks = []
+    for italic, weight in requested:
+        if italic and not profile['italic']:
+            return 400, f"Font family not found or unsupported axis: {family} ital"
+        if isinstance(weight, tuple) and not profile['variable']:
+            return 400, f"Font family not found or unsupported axis range: {family} wght"
+        if isinstance(weight, int) and weight not in profile['weights']:
+            return 400, f"Font family not found or unsupported weight: {family} {weight}"
+        style = "italic" if italic else "normal"
+        for subset, unicode_range in profile['subsets']:
+            variant = "var" if profile['variable'] else str(weight)
+            path = f"/s/{slug}/v1/{hashlib.sha1(f'{family}|{style}|{variant}|{subset}'.encode('utf-8')).hexdigest()[:16]}.woff2"
+            weight_css = f"{weight[0]} {weight[1]}" if isinstance(weight, tuple) else str(weight)
+            blocks.append(
+                f"/* {subset} */\n@font-face {{\n  font-family: '{family}';\n  font-style: {style};\n"
+                f"  font-weight: {weight_css};\n  font-display: {display};\n"
+                f"  src: url({STATIC_PLACEHOLDER}{path}) format('woff2');\n  unicode-range: {unicode_range};\n}}\n"
+            )
+    return 200, "".join(blocks)
+
+class FakeGoogleFonts:
+    """Serves CSS2 responses and woff2 files over HTTP on localhost, counting what it serves."""
+    def __init__(self, fixtures_dir=None, latency=0.0, truncate_rate=0.0, seed=None):
+        self.latency = latency
+        # Fraction of font responses cut off halfway, to exercise resumed downloads
+        self.truncate_rate = truncate_rate
+        self.random = random.Random(seed)
+        self.fixtures_dir = Path(fixtures_dir) if fixtures_dir else None
+        self.fixtures = None
+        if self.fixtures_dir:
+            with open(self.fixtures_dir / FIXTURE_INDEX, "r", encoding="utf-8") as f:
+                self.fixtures = json.load(f)
+        self.lock = threading.Lock()
+        self.server = None
+        self.static_url = None
+        self.reset_counts()
+
+    def reset_counts(self):
+        with self.lock:
+            self.counts = {
+                'css_requests': 0, 'font_requests': 0, 'not_modified': 0, 'errors': 0,
+                'bytes_served': 0, 'resumed': 0, 'truncated': 0, 'css_by_family': {},
+            }
+
+    def css_response(self, family_param, display):
+        if self.fixtures is not None:
+            entry = self.fixtures['css'].get(family_param)
+            if entry is None:
+                return 400, "Not recorded"
+            return entry['status'], entry['body']
+        family, _, spec = family_param.partition(":")
+        return synthesize_css(family, spec, display)
+
+    def font_response(self, path):
+        if self.fixtures is not None:
+            relative = self.fixtures['files'].get(path)
+            if relative is None:
+                return 404, b""
+            return 200, (self.fixtures_dir / relative).read_bytes()
+        return 200, font_bytes(path)
+
+    def handle(self, path, headers):
+        """Returns (status, body bytes, response headers) for one GET."""
+        if self.latency:
+            time.sleep(self.latency)
+        url = urlparse(path)
+        if url.path.endswith("/css2"):
+            query = parse_qs(url.query)
+            family_param = query.get('family', [""])[0]
+            status, text = self.css_response(family_param, query.get('display', ["auto"])[0])
+            body = text.replace(STATIC_PLACEHOLDER, self.static_url).encode('utf-8')
+            with self.lock:
+                self.counts['css_requests'] += 1
+                family = family_param.partition(":")[0]
+                self.counts['css_by_family'][family] = self.counts['css_by_family'].get(family, 0) + 1
+            content_type = "text/css; charset=utf-8"
+        elif url.path.startswith("/s/"):
+            status, body = self.font_response(url.path)
+            with self.lock:
+                self.counts['font_requests'] += 1
+            content_type = "font/woff2"
+        else:
+            status, body, content_type = 404, b"", "text/plain"
+
+        etag = f'"{hashlib.sha1(body).hexdigest()}"'
+        if status == 200 and headers.get('If-None-Match') == etag:
+            with self.lock:
+                self.counts['not_modified'] += 1
+            return 304, b"", {'ETag': etag}
+        response_headers = {'Content-Type': content_type, 'ETag': etag}
+        range_match = RANGE_RE.match(headers.get('Range') or "")
+        if status == 200 and range_match and headers.get('If-Range', etag) == etag:
+            start = int(range_match.group(1))
+            if start < len(body):
+                response_headers['Content-Range'] = f"bytes {start}-{len(body) - 1}/{len(body)}"
+                status, body = 206, body[start:]
+                with self.lock:
+                    self.counts['resumed'] += 1
+            else:
+                response_headers['Content-Range'] = f"bytes */{len(body)}"
+                status, body = 416, b""
+        with self.lock:
+            if status >= 400:
+                self.counts['errors'] += 1
+            self.counts['bytes_served'] += len(body)
+        return status, body, response_headers
+
+    def should_truncate(self, status):
+        with self.lock:
+            if status in (200, 206) and self.truncate_rate and self.random.random() < self.truncate_rate:
+                self.counts['truncated'] += 1
+                return True
+        return False
+
+    def start(self, host="127.0.0.1", port=0):
+        """Serves in a background thread; returns the base URL for both endpoints."""
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                status, body, headers = fake.handle(self.path, self.headers)
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                if self.path.startswith("/s/") and fake.should_truncate(status):
+                    # Simulate a dropped connection halfway through the body
+                    self.wfile.write(body[:len(body) // 2])
+                    self.close_connection = True
+                    return
+                self.wfile.write(body)
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.static_url = f"http://{host}:{self.server.server_port}"
+        return self.static_url
+
+    def stop(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+def record_fixtures(out_dir, families=None):
+    """Captures the real CSS2 responses (every AXES_QUERIES variant) and woff2 files into out_dir."""
+    import download_fonts
+    out_dir = Path(out_dir)
+    (out_dir / "files").mkdir(parents=True, exist_ok=True)
+    session = download_fonts.create_session()
+    index = {'css': {}, 'files': {}}
+    for family in families or download_fonts.FONT_FAMILIES:
+        for axes in download_fonts.AXES_QUERIES:
+            family_param = f"{family}:{axes}" if axes else family
+            response = session.get(download_fonts.FONTS_CSS_URL,
+                                   params={'family': family_param, 'display': download_fonts.FONT_DISPLAY_PARAM})
+            body = response.text
+            index['css'][family_param] = {
+                'status': response.status_code,
+                'body': body.replace(download_fonts.FONTS_STATIC_URL, STATIC_PLACEHOLDER),
+            }
+            if not response.ok:
+                continue
+            for url in download_fonts.FONT_SRC_RE.findall(body):
+                path = urlparse(url).path
+                if path in index['files']:
+                    continue
+                relative = f"files/{hashlib.sha256(path.encode('utf-8')).hexdigest()}.woff2"
+                font_response = session.get(url)
+                font_response.raise_for_status()
+                (out_dir / relative).write_bytes(font_response.content)
+                index['files'][path] = relative
+        print(f"Recorded {family}")
+    with open(out_dir / FIXTURE_INDEX, "w", encoding="utf-8") as f:
+        json.dump(index, f, indent=2, sort_keys=True)
+    print(f"Recorded {len(index['css'])} CSS responses and {len(index['files'])} font files to {out_dir}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve a local stand-in for the Google Fonts CSS2 API and gstatic.")
+    parser.add_argument("--port", type=int, default=8788)
+    parser.add_argument("--fixtures", default=None, help="Replay responses recorded in this directory instead of synthesizing them")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every response")
+    parser.add_argument("--truncate-rate", type=float, default=0.0, help="Fraction of font responses cut off halfway")
+    parser.add_argument("--record", metavar="DIR", default=None,
+                        help="Record the real Google Fonts responses into DIR (needs network) and exit")
+    args = parser.parse_args()
+
+    if args.record:
+        record_fixtures(args.record)
+    else:
+        fake = FakeGoogleFonts(args.fixtures, latency=args.latency, truncate_rate=args.truncate_rate)
+        base_url = fake.start(port=args.port)
+        print(f"Fake Google Fonts at {base_url}")
+        print(f"Run with GOOGLE_FONTS_CSS_URL={base_url}/css2 GOOGLE_FONTS_STATIC_URL={base_url}")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            print(f"\nCounts: {json.dumps(fake.counts)}")
+            fake.stop()
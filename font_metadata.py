@@ -0,0 +1,307 @@
+import json
+import mmap
+import os
+import re
+import struct
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+# Identity read from the font binary, cached by file name with its mtime and size
+METADATA_CACHE_FILE = os.path.join(".font_cache", "metadata.json")
+FONT_EXTENSIONS = ('.woff2', '.woff', '.ttf', '.otf')
+
+# Tables we actually need; everything else in the file is never read
+WANTED_TABLES = (b'name', b'OS/2', b'fvar', b'cmap')
+
+# WOFF2 known-table tags, indexed by the low 6 bits of the directory flags byte
+WOFF2_KNOWN_TAGS = [
+    b'cmap', b'head', b'hhea', b'hmtx', b'maxp', b'name', b'OS/2', b'post', b'cvt ', b'fpgm',
+    b'glyf', b'loca', b'prep', b'CFF ', b'VORG', b'EBDT', b'EBLC', b'gasp', b'hdmx', b'kern',
+    b'LTSH', b'PCLT', b'VDMX', b'vhea', b'vmtx', b'BASE', b'GDEF', b'GPOS', b'GSUB', b'EBSC',
+    b'JSTF', b'MATH', b'CBDT', b'CBLC', b'COLR', b'CPAL', b'SVG ', b'sbix', b'acnt', b'avar',
+    b'bdat', b'bloc', b'bsln', b'cvar', b'fdsc', b'feat', b'fmtx', b'fvar', b'gvar', b'hsty',
+    b'just', b'lcar', b'mort', b'morx', b'opbd', b'prop', b'trak', b'Zapf', b'Silf', b'Glat',
+    b'Gloc', b'Feat', b'Sill',
+]
+
+# Google's variable files name the family after their default instance, e.g. "Archivo SemiBold"
+# or "DM Sans 9pt"; these trailing words are dropped from variable family names
+WEIGHT_NAME_WORDS = (
+    'Thin', 'Hairline', 'ExtraLight', 'UltraLight', 'Light', 'Regular', 'Book', 'Medium',
+    'SemiBold', 'DemiBold', 'Bold', 'ExtraBold', 'UltraBold', 'Black', 'Heavy',
+)
+
+class FontFormatError(Exception):
+    pass
+
+def _read_sfnt_tables(data):
+    num_tables = struct.unpack_from(">H", data, 4)[0]
+    tables = {}
+    for i in range(num_tables):
+        tag, _, offset, length = struct.unpack_from(">4sIII", data, 12 + 16 * i)
+        if tag in WANTED_TABLES:
+            tables[tag] = bytes(data[offset:offset + length])
+    return tables
+
+def _read_woff_tables(data):
+    num_tables = struct.unpack_from(">H", data, 12)[0]
+    tables = {}
+    for i in range(num_tables):
+        tag, offset, comp_length, orig_length, _ = struct.unpack_from(">4sIIII", data, 44 + 20 * i)
+        if tag not in WANTED_TABLES:
+            continue
+        raw = bytes(data[offset:offset + comp_length])
+        tables[tag] = zlib.decompress(raw) if comp_length < orig_length else raw
+    return tables
+
+def _read_base128(data, pos):
+    value = 0
+    for i in range(5):
+        byte = data[pos + i]
+        value = (value << 7) | (byte & 0x7F)
+        if not byte & 0x80:
+            return value, pos + i + 1
+    raise FontFormatError("bad UIntBase128")
+
+def _read_woff2_tables(data):
+    try:
+        import brotli
+    except ImportError:
+        raise FontFormatError("brotli is required to read woff2 tables (pip install brotli)")
+    flavor, _, num_tables = struct.unpack_from(">4sIH", data, 4)
+    if flavor == b'ttcf':
+        raise FontFormatError("woff2 collections are not supported")
+    total_compressed = struct.unpack_from(">I", data, 20)[0]
+    pos = 48
+    layout = []
+    stream_offset = 0
+    for _ in range(num_tables):
+        flags = data[pos]
+        pos += 1
+        if flags & 0x3F == 0x3F:
+            tag = bytes(data[pos:pos + 4])
+            pos += 4
+        else:
+            tag = WOFF2_KNOWN_TAGS[flags & 0x3F]
+        length, pos = _read_base128(data, pos)
+        version = flags >> 6
+        transformed = version == 0 if tag in (b'glyf', b'loca') else version != 0
+        if transformed:
+            length, pos = _read_base128(data, pos)
+        layout.append((tag, stream_offset, length))
+        stream_offset += length
+
+    # All tables share one brotli stream; decompress only up to the end of the last wanted table
+    needed = max((offset + length for tag, offset, length in layout if tag in WANTED_TABLES), default=0)
+    decompressor = brotli.Decompressor()
+    output = bytearray()
+    compressed = data[pos:pos + total_compressed]
+    chunk_size = 16 * 1024
+    for start in range(0, len(compressed), chunk_size):
+        if len(output) >= needed:
+            break
+        output += decompressor.process(bytes(compressed[start:start + chunk_size]))
+    return {
+        tag: bytes(output[offset:offset + length])
+        for tag, offset, length in layout
+        if tag in WANTED_TABLES and offset + length <= len(output)
+    }
+
+def read_font_tables(path):
+    """Returns {tag: bytes} for the name/OS/2/fvar/cmap tables of a ttf/otf/woff/woff2 file."""
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        signature = data[:4]
+        if signature in (b'\x00\x01\x00\x00', b'OTTO', b'true'):
+            return _read_sfnt_tables(data)
+        if signature == b'wOFF':
+            return _read_woff_tables(data)
+        if signature == b'wOF2':
+            return _read_woff2_tables(data)
+    raise FontFormatError(f"unrecognised font signature {signature!r}")
+
+def _decode_name(platform_id, raw):
+    if platform_id in (0, 3):
+        return raw.decode('utf-16-be', errors='replace')
+    return raw.decode('mac-roman', errors='replace')
+
+def parse_name_table(table):
+    """Returns {name_id: string}, preferring Windows English records."""
+    _, count, string_offset = struct.unpack_from(">HHH", table, 0)
+    names = {}
+    ranks = {}
+    for i in range(count):
+        platform_id, _, language_id, name_id, length, offset = struct.unpack_from(">HHHHHH", table, 6 + 12 * i)
+        if name_id not in (1, 2, 16, 17):
+            continue
+        rank = 0 if (platform_id, language_id) == (3, 0x409) else 1 if platform_id in (0, 3) else 2
+        if name_id in ranks and ranks[name_id] <= rank:
+            continue
+        start = string_offset + offset
+        names[name_id] = _decode_name(platform_id, table[start:start + length])
+        ranks[name_id] = rank
+    return names
+
+def parse_fvar_weight(table):
+    """Returns (min, max) of the wght axis, or None if the font has no weight axis."""
+    axes_offset, _, axis_count, axis_size = struct.unpack_from(">HHHH", table, 4)
+    for i in range(axis_count):
+        tag, min_value, _, max_value = struct.unpack_from(">4siii", table, axes_offset + axis_size * i)
+        if tag == b'wght':
+            return round(min_value / 65536), round(max_value / 65536)
+    return None
+
+def parse_cmap_ranges(table):
+    """Returns the mapped code points as sorted [start, end] pairs (formats 4 and 12)."""
+    num_subtables = struct.unpack_from(">H", table, 2)[0]
+    best = None
+    for i in range(num_subtables):
+        platform_id, encoding_id, offset = struct.unpack_from(">HHI", table, 4 + 8 * i)
+        fmt = struct.unpack_from(">H", table, offset)[0]
+        if fmt == 12 and (best is None or best[0] != 12):
+            best = (12, offset)
+        elif fmt == 4 and best is None and platform_id in (0, 3):
+            best = (4, offset)
+    if best is None:
+        return []
+    fmt, offset = best
+    ranges = []
+    if fmt == 12:
+        num_groups = struct.unpack_from(">I", table, offset + 12)[0]
+        for i in range(num_groups):
+            start, end, _ = struct.unpack_from(">III", table, offset + 16 + 12 * i)
+            ranges.append([start, end])
+    else:
+        seg_count = struct.unpack_from(">H", table, offset + 6)[0] // 2
+        ends_at = offset + 14
+        starts_at = ends_at + 2 * seg_count + 2
+        deltas_at = starts_at + 2 * seg_count
+        range_offsets_at = deltas_at + 2 * seg_count
+        for i in range(seg_count):
+            end = struct.unpack_from(">H", table, ends_at + 2 * i)[0]
+            start = struct.unpack_from(">H", table, starts_at + 2 * i)[0]
+            if start == 0xFFFF:
+                continue
+            range_offset = struct.unpack_from(">H", table, range_offsets_at + 2 * i)[0]
+            if range_offset == 0:
+                ranges.append([start, end])
+                continue
+            # Segment indexes glyphIdArray; code points mapped to glyph 0 are not covered
+            glyph_at = range_offsets_at + 2 * i + range_offset
+            for code in range(start, end + 1):
+                if struct.unpack_from(">H", table, glyph_at + 2 * (code - start))[0]:
+                    ranges.append([code, code])
+    ranges.sort()
+    merged = []
+    for start, end in ranges:
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+def read_font_metadata(path):
+    """Reads family, style, weight (a "min max" range for variable fonts) and cmap coverage."""
+    tables = read_font_tables(path)
+    if b'name' not in tables or b'OS/2' not in tables:
+        raise FontFormatError("missing name or OS/2 table")
+    names = parse_name_table(tables[b'name'])
+    weight_class = struct.unpack_from(">H", tables[b'OS/2'], 4)[0]
+    fs_selection = struct.unpack_from(">H", tables[b'OS/2'], 62)[0]
+    subfamily = names.get(17) or names.get(2) or ""
+    italic = bool(fs_selection & 0x201) or 'italic' in subfamily.lower()
+    weight = str(weight_class)
+    wght_axis = parse_fvar_weight(tables[b'fvar']) if b'fvar' in tables else None
+    if wght_axis and wght_axis[0] != wght_axis[1]:
+        weight = f"{wght_axis[0]} {wght_axis[1]}"
+    family = names.get(16) or names.get(1) or ""
+    if wght_axis:
+        words = family.split()
+        while len(words) > 1 and (words[-1] in WEIGHT_NAME_WORDS or re.fullmatch(r'\d+pt', words[-1])):
+            words.pop()
+        family = " ".join(words)
+    return {
+        'family': family,
+        'subfamily': subfamily,
+        'style': 'italic' if italic else 'normal',
+        'weight': weight,
+        'variable': wght_axis is not None,
+        'cmap_ranges': parse_cmap_ranges(tables[b'cmap']) if b'cmap' in tables else [],
+    }
+
+def _read_one(path):
+    try:
+        return read_font_metadata(path), None
+    except (OSError, ValueError, IndexError, struct.error, zlib.error, FontFormatError) as e:
+        return None, str(e)
+
+def load_metadata_cache():
+    try:
+        with open(METADATA_CACHE_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_metadata_cache(cache):
+    os.makedirs(os.path.dirname(METADATA_CACHE_FILE), exist_ok=True)
+    tmp_path = METADATA_CACHE_FILE + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(cache, f)
+    os.replace(tmp_path, METADATA_CACHE_FILE)
+
+def read_font_directory(font_dir, max_workers=None, filenames=None):
+    """Returns {file name: metadata} for every font in font_dir.
+
+    Files whose mtime and size match the cache are not reopened; the rest are
+    read across a process pool. Unreadable files are reported and left out.
+    """
+    if filenames is None:
+        filenames = os.listdir(font_dir)
+    cache = load_metadata_cache()
+    cache_key_prefix = os.path.abspath(font_dir) + os.sep
+    results = {}
+    stale = {}
+    for fname in filenames:
+        if not fname.lower().endswith(FONT_EXTENSIONS):
+            continue
+        path = os.path.join(font_dir, fname)
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        entry = cache.get(cache_key_prefix + fname)
+        if entry and entry['mtime_ns'] == st.st_mtime_ns and entry['size'] == st.st_size:
+            if entry['metadata'] is not None:
+                results[fname] = entry['metadata']
+            continue
+        stale[fname] = (path, st)
+
+    if stale:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            paths = [path for path, _ in stale.values()]
+            chunksize = max(1, len(paths) // (4 * (os.cpu_count() or 1)))
+            for (fname, (path, st)), (metadata, error) in zip(stale.items(), executor.map(_read_one, paths, chunksize=chunksize)):
+                if error:
+                    print(f"Warning: Could not read font metadata from {fname}: {error}")
+                else:
+                    results[fname] = metadata
+                cache[cache_key_prefix + fname] = {'mtime_ns': st.st_mtime_ns, 'size': st.st_size, 'metadata': metadata}
+        save_metadata_cache(cache)
+    return results
+
+def move_cache_entries(font_dir, renames):
+    """Re-keys cached metadata after files in font_dir were renamed ({old: new})."""
+    cache = load_metadata_cache()
+    prefix = os.path.abspath(font_dir) + os.sep
+    moved = False
+    for old, new in renames.items():
+        entry = cache.pop(prefix + old, None)
+        if entry is not None:
+            cache[prefix + new] = entry
+            moved = True
+    if moved:
+        save_metadata_cache(cache)
+
+def weight_bounds(weight):
+    """(min, max) of a "400" or "100 900" weight string."""
+    parts = [int(part) for part in str(weight).split()]
+    return min(parts), max(parts)
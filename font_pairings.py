@@ -0,0 +1,31 @@
+import re
+from pathlib import Path
+
+# FONT_PAIRINGS is defined for the carousel UI; the font scripts read it from there
+PAIRINGS_SOURCE = Path("constants/carouselConstants.js")
+
+PAIRING_RE = re.compile(
+    r"\{\s*label:\s*'([^']+)',\s*heading:\s*'([^']+)',\s*paragraph:\s*'([^']+)'\s*\}"
+)
+
+def load_font_pairings(path=PAIRINGS_SOURCE):
+    """Returns FONT_PAIRINGS as a list of {'label', 'heading', 'paragraph'} dicts."""
+    with open(path, "r", encoding="utf-8") as f:
+        source = f.read()
+    start = source.find("FONT_PAIRINGS = [")
+    if start == -1:
+        raise ValueError(f"FONT_PAIRINGS not found in {path}")
+    end = source.find("];", start)
+    return [
+        {'label': label, 'heading': heading, 'paragraph': paragraph}
+        for label, heading, paragraph in PAIRING_RE.findall(source[start:end])
+    ]
+
+def pairing_families(pairings):
+    """Distinct heading/paragraph families used by the pairings, in first-use order."""
+    families = []
+    for pairing in pairings:
+        for family in (pairing['heading'], pairing['paragraph']):
+            if family not in families:
+                families.append(family)
+    return families
@@ -0,0 +1,204 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import struct
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# Content-addressed font store: every binary is saved once as <sha256>.<ext>
+FONT_STORE_DIR = Path("public/fonts")
+# Build manifest mapping (family, style, weight, unicode-range) -> sha256/size/file
+FONT_MANIFEST_FILE = Path("font_manifest.json")
+MANIFEST_VERSION = 1
+
+STORE_NAME_RE = re.compile(r'^[0-9a-f]{64}\.(?:woff2|woff|ttf|otf)$')
+# One "U+<hex>[-<hex>]" or wildcard "U+<hex>??" part of a CSS unicode-range value
+UNICODE_RANGE_PART_RE = re.compile(r'U\+([0-9A-F?]+)(?:-([0-9A-F]+))?', re.IGNORECASE)
+
+# Leading signature of each container; WOFF and WOFF2 also declare their total length at offset 8
+FONT_SIGNATURES = {
+    '.woff2': (b'wOF2',),
+    '.woff': (b'wOFF',),
+    '.ttf': (b'\x00\x01\x00\x00', b'true'),
+    '.otf': (b'OTTO', b'\x00\x01\x00\x00'),
+}
+
+def is_store_name(fname):
+    """True if fname is a content-addressed store file (and must not be renamed)."""
+    return bool(STORE_NAME_RE.match(fname))
+
+def clean_family(name):
+    """Lowercase, hyphen-separated form of a family name (or label) used in file names."""
+    return re.sub(r'[^a-z0-9]+', '-', name.lower()).strip('-')
+
+def parse_unicode_ranges(value):
+    """Parses a CSS unicode-range value into [(first, last)] code point ranges."""
+    ranges = []
+    for start, end in UNICODE_RANGE_PART_RE.findall(value or ""):
+        if '?' in start:
+            # Wildcard form, e.g. U+4?? -> U+400-4FF
+            start, end = start.replace('?', '0'), start.replace('?', 'F')
+        ranges.append((int(start, 16), int(end or start, 16)))
+    return ranges
+
+def hash_bytes(data):
+    return hashlib.sha256(data).hexdigest()
+
+def hash_file(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def store_path(digest, extension=".woff2", store_dir=FONT_STORE_DIR):
+    return Path(store_dir) / f"{digest}{extension}"
+
+def store_font_bytes(data, extension=".woff2", store_dir=FONT_STORE_DIR):
+    """Saves data under its SHA-256 name unless an identical blob is already stored.
+
+    Returns a dict with 'sha256', 'size' and 'file' (the name relative to the store dir).
+    """
+    digest = hash_bytes(data)
+    path = store_path(digest, extension, store_dir)
+    if not path.exists():
+        Path(store_dir).mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(dir=store_dir, prefix=".store-", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_name, path)
+        except BaseException:
+            if os.path.exists(tmp_name):
+                os.remove(tmp_name)
+            raise
+    return {'sha256': digest, 'size': len(data), 'file': path.name}
+
+def store_font_file(src_path, digest, extension=".woff2", store_dir=FONT_STORE_DIR):
+    """Moves an already hashed file into the store under its SHA-256 name (or drops it if stored).
+
+    Returns the same dict as store_font_bytes.
+    """
+    path = store_path(digest, extension, store_dir)
+    size = os.path.getsize(src_path)
+    if path.exists():
+        os.remove(src_path)
+        return {'sha256': digest, 'size': size, 'file': path.name}
+    Path(store_dir).mkdir(parents=True, exist_ok=True)
+    try:
+        os.replace(src_path, path)
+    except OSError:
+        # Different filesystem: copy next to the target first so the final rename stays atomic
+        fd, tmp_name = tempfile.mkstemp(dir=store_dir, prefix=".store-", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as dst, open(src_path, "rb") as src:
+                shutil.copyfileobj(src, dst)
+            os.replace(tmp_name, path)
+        except BaseException:
+            if os.path.exists(tmp_name):
+                os.remove(tmp_name)
+            raise
+        os.remove(src_path)
+    return {'sha256': digest, 'size': size, 'file': path.name}
+
+def check_font_header(path, extension=None, size=None):
+    """Checks a font's signature (and declared length for WOFF/WOFF2) without reading the body.
+
+    Returns a description of the problem, or None if the header looks right.
+    """
+    extension = (extension or os.path.splitext(str(path))[1]).lower()
+    if size is None:
+        size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        header = f.read(12)
+    signatures = FONT_SIGNATURES.get(extension)
+    if signatures and header[:4] not in signatures:
+        return f"bad signature {header[:4]!r} for {extension}"
+    if extension in ('.woff', '.woff2'):
+        if len(header) < 12:
+            return "truncated header"
+        declared = struct.unpack(">I", header[8:12])[0]
+        if declared != size:
+            return f"declared length {declared} but {size} bytes on disk"
+    return None
+
+def verify_store_entry(entry, store_dir=FONT_STORE_DIR, check_hash=True):
+    """Checks a stored file against its manifest entry: presence, size, header and (unless check_hash is False) SHA-256.
+
+    Returns a description of the problem, or None if the file is intact.
+    """
+    path = Path(store_dir) / entry['file']
+    try:
+        size = path.stat().st_size
+    except OSError:
+        return "missing"
+    if size != entry['size']:
+        return f"size {size}, manifest says {entry['size']}"
+    problem = check_font_header(path, size=size)
+    if problem:
+        return problem
+    if check_hash and hash_file(path) != entry['sha256']:
+        return "sha256 mismatch"
+    return None
+
+def verify_manifest(manifest, store_dir=FONT_STORE_DIR, max_workers=8):
+    """Verifies every distinct file in the manifest in parallel; returns [(file, problem)]."""
+    entries = {}
+    for face in manifest.get('faces', []):
+        entries.setdefault(face['file'], face)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = executor.map(lambda entry: verify_store_entry(entry, store_dir), entries.values())
+        return [(name, problem) for name, problem in zip(entries, results) if problem]
+
+def face_key(face):
+    return (face['family'], face['style'], str(face['weight']), face.get('unicode_range') or '')
+
+def load_manifest(path=FONT_MANIFEST_FILE):
+    """Loads the build manifest, returning an empty one if it is missing or unreadable."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {'version': MANIFEST_VERSION, 'faces': []}
+    manifest.setdefault('faces', [])
+    return manifest
+
+def save_manifest(faces, path=FONT_MANIFEST_FILE):
+    """Writes the manifest for the given faces (dicts carrying family/style/weight/unicode_range/url
+    plus the store fields), keeping their order and dropping duplicate keys."""
+    entries = []
+    seen = set()
+    for face in faces:
+        key = face_key(face)
+        if key in seen:
+            continue
+        seen.add(key)
+        entries.append({
+            'family': face['family'],
+            'style': face['style'],
+            'weight': str(face['weight']),
+            'unicode_range': face.get('unicode_range'),
+            'url': face.get('url'),
+            'sha256': face['sha256'],
+            'size': face['size'],
+            'file': face['file'],
+        })
+    manifest = {'version': MANIFEST_VERSION, 'faces': entries}
+    tmp_path = Path(f"{path}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+        f.write("\n")
+    os.replace(tmp_path, path)
+    return manifest
+
+def manifest_url_index(manifest, store_dir=FONT_STORE_DIR):
+    """Maps source URL -> stored entry for manifest faces whose blob is still on disk."""
+    index = {}
+    for entry in manifest.get('faces', []):
+        url = entry.get('url')
+        if url and (Path(store_dir) / entry['file']).exists():
+            index[url] = {'sha256': entry['sha256'], 'size': entry['size'], 'file': entry['file']}
+    return index
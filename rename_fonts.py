@@ -1,15 +1,23 @@
 import os
 import re
+import json
+import time
+import argparse
+from font_store import is_store_name, clean_family
+from font_metadata import read_font_directory, move_cache_entries, weight_bounds
 
 FONT_DIR = "public/fonts"
-
-# Helper to clean up font family names
-def clean_family(name):
-    return re.sub(r'[^a-z0-9]+', '-', name.lower()).strip('-')
+# The planned batch is written here before any file is touched, so it can be rolled back
+JOURNAL_FILE = os.path.join(".font_cache", "rename_journal.json")
+TEMP_SUFFIX = ".renaming"
 
 # Try to extract family, style, weight from filename
 def parse_font_filename(filename):
     base = filename.replace('.woff2', '')
+    # Already canonical, e.g. lato-normal-400 or lato-normal-400-2
+    m = re.match(r'([a-z0-9-]+?)-(italic|normal)-(\d{3})(?:-\d+)?$', base)
+    if m:
+        return m.group(1), m.group(2), m.group(3)
     # Try to match known patterns
     # e.g. roboto-KFO7CnqEu92Fr1ME7kSn66aGLdTylUAMa3yUBA
     m = re.match(r'([a-z0-9-]+)[-_](italic|normal)?[-_]?(\d{3})?', base)
@@ -28,24 +36,139 @@ def parse_font_filename(filename):
     # Fallback: use the whole base as family
     return base, 'normal', '400'
 
-def main():
-    seen = {}
-    for fname in os.listdir(FONT_DIR):
-        if not fname.endswith('.woff2'):
-            continue
-        old_path = os.path.join(FONT_DIR, fname)
+# Canonical names the planner produces: family-style-weight[-counter].woff2
+def is_canonical(fname, base):
+    return fname == f"{base}.woff2" or re.fullmatch(re.escape(base) + r'-\d+\.woff2', fname) is not None
+
+# Prefer the identity read from the font binary; fall back to guessing from the name
+def target_base(fname, metadata=None):
+    meta = metadata.get(fname) if metadata else None
+    if meta and meta['family']:
+        family, style, weight = meta['family'], meta['style'], weight_bounds(meta['weight'])[0]
+    else:
         family, style, weight = parse_font_filename(fname)
-        base_new_fname = f"{clean_family(family)}-{style}-{weight}"
-        new_fname = f"{base_new_fname}.woff2"
-        counter = 1
-        while new_fname in seen or os.path.exists(os.path.join(FONT_DIR, new_fname)):
-            new_fname = f"{base_new_fname}-{counter}.woff2"
+    return f"{clean_family(family)}-{style}-{weight}"
+
+# Compute the whole old -> new mapping from a single directory listing
+def plan_renames(filenames, metadata=None):
+    candidates = sorted(f for f in filenames if f.endswith('.woff2') and not is_store_name(f))
+    # Names held by files outside the plan can never be reused
+    taken = set(filenames) - set(candidates)
+    targets = {fname: target_base(fname, metadata) for fname in candidates}
+    # Files that already carry a canonical name for their target keep it, so reruns are no-ops
+    plan = {}
+    for fname, base in targets.items():
+        if is_canonical(fname, base) and fname not in taken:
+            plan[fname] = fname
+            taken.add(fname)
+    next_counter = {}
+    for fname, base in targets.items():
+        if fname in plan:
+            continue
+        counter = next_counter.get(base, 0)
+        new_fname = f"{base}.woff2" if counter == 0 else f"{base}-{counter}.woff2"
+        while new_fname in taken:
             counter += 1
-        seen[new_fname] = True
-        new_path = os.path.join(FONT_DIR, new_fname)
-        if old_path != new_path:
-            print(f"Renaming: {fname} -> {new_fname}")
-            os.rename(old_path, new_path)
+            new_fname = f"{base}-{counter}.woff2"
+        next_counter[base] = counter + 1
+        taken.add(new_fname)
+        plan[fname] = new_fname
+    return {old: new for old, new in plan.items() if old != new}
+
+def write_journal(renames, state):
+    os.makedirs(os.path.dirname(JOURNAL_FILE), exist_ok=True)
+    tmp_path = JOURNAL_FILE + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({'created': time.time(), 'state': state, 'renames': renames}, f, indent=2)
+    os.replace(tmp_path, JOURNAL_FILE)
+
+def load_journal():
+    with open(JOURNAL_FILE, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def _move(src, dst):
+    src_path, dst_path = os.path.join(FONT_DIR, src), os.path.join(FONT_DIR, dst)
+    # os.rename silently replaces an existing file on POSIX; never let it
+    if os.path.exists(dst_path):
+        raise FileExistsError(f"Refusing to rename {src} onto existing {dst}")
+    os.rename(src_path, dst_path)
+
+def _undo(renames, state):
+    # While 'pending' every file is at old or temp; once 'renaming' or 'applied' it is at temp or new.
+    # Files at new are parked on their temp names first, so no move lands on a name still in use.
+    if state != 'pending':
+        for old, new in renames:
+            temp_path = os.path.join(FONT_DIR, old + TEMP_SUFFIX)
+            if not os.path.exists(temp_path) and os.path.exists(os.path.join(FONT_DIR, new)):
+                _move(new, old + TEMP_SUFFIX)
+    for old, new in renames:
+        if os.path.exists(os.path.join(FONT_DIR, old + TEMP_SUFFIX)):
+            _move(old + TEMP_SUFFIX, old)
+        elif not os.path.exists(os.path.join(FONT_DIR, old)):
+            print(f"Warning: {old} (renamed to {new}) is missing; cannot restore it.")
+
+# Apply the batch in two phases (old -> temp -> new) so swaps and chains cannot clobber each other
+def apply_renames(plan):
+    renames = sorted(plan.items())
+    write_journal(renames, 'pending')
+    state = 'pending'
+    try:
+        for old, new in renames:
+            _move(old, old + TEMP_SUFFIX)
+        write_journal(renames, 'renaming')
+        state = 'renaming'
+        for old, new in renames:
+            print(f"Renaming: {old} -> {new}")
+            _move(old + TEMP_SUFFIX, new)
+    except OSError as e:
+        print(f"Error while renaming ({e}); rolling back.")
+        _undo(renames, state)
+        write_journal(renames, 'rolled-back')
+        raise
+    write_journal(renames, 'applied')
+
+def rollback():
+    try:
+        journal = load_journal()
+    except (OSError, ValueError):
+        print(f"No rename journal found at {JOURNAL_FILE}.")
+        return
+    if journal['state'] == 'rolled-back':
+        print("Last rename batch was already rolled back.")
+        return
+    print(f"Rolling back {len(journal['renames'])} renames ({journal['state']} batch)...")
+    _undo(journal['renames'], journal['state'])
+    write_journal(journal['renames'], 'rolled-back')
+
+def main(dry_run=False):
+    try:
+        journal = load_journal()
+    except (OSError, ValueError):
+        journal = None
+    if journal and journal['state'] in ('pending', 'renaming'):
+        print("A previous rename batch did not finish; rolling it back first.")
+        rollback()
+    filenames = os.listdir(FONT_DIR)
+    metadata = read_font_directory(FONT_DIR, filenames=[f for f in filenames if f.endswith('.woff2') and not is_store_name(f)])
+    plan = plan_renames(filenames, metadata)
+    if not plan:
+        print("All font files already have canonical names.")
+        return
+    if dry_run:
+        for old, new in sorted(plan.items()):
+            print(f"Would rename: {old} -> {new}")
+        print(f"{len(plan)} files would be renamed.")
+        return
+    apply_renames(plan)
+    move_cache_entries(FONT_DIR, plan)
+    print(f"Renamed {len(plan)} files (journal: {JOURNAL_FILE}).")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Rename downloaded woff2 files to family-style-weight names.")
+    parser.add_argument("--dry-run", action="store_true", help="Print the planned renames without applying them")
+    parser.add_argument("--rollback", action="store_true", help="Undo the last rename batch from the journal")
+    args = parser.parse_args()
+    if args.rollback:
+        rollback()
+    else:
+        main(dry_run=args.dry_run)
@@ -0,0 +1,194 @@
+import atexit
+import cProfile
+import io
+import json
+import os
+import pstats
+import re
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+# Process-wide counters, latency histograms and stage timings for the Python tooling.
+# Scripts record into the module-level registry and call write_report() once at the end;
+# the report is written as JSON and in the Prometheus text format.
+METRICS_DIR = Path(os.environ.get("RUN_METRICS_DIR") or Path(__file__).resolve().parent / ".metrics")
+# Latency buckets in seconds (upper bounds; +Inf is implied)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+PROFILE_TOP_FUNCTIONS = 15
+
+_lock = threading.Lock()
+_counters = {}    # (name, labels) -> value
+_histograms = {}  # (name, labels) -> {'buckets': [...], 'sum': float, 'count': int}
+_stages = []      # {'name', 'seconds'} in completion order
+_profiles = {}    # name -> summary of the captured cProfile
+_profiling = bool(os.environ.get("RUN_METRICS_PROFILE"))
+_active_profile = threading.local()
+_started = time.time()
+
+def _label_key(labels):
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+def inc(name, amount=1, **labels):
+    """Adds amount to a counter."""
+    key = (name, _label_key(labels))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+def observe(name, value, **labels):
+    """Records one sample (usually seconds) in a histogram."""
+    key = (name, _label_key(labels))
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = {'buckets': [0] * len(LATENCY_BUCKETS), 'sum': 0.0, 'count': 0}
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if value <= bound:
+                histogram['buckets'][i] += 1
+        histogram['sum'] += value
+        histogram['count'] += 1
+
+@contextmanager
+def timed(name, **labels):
+    """Observes the wall time of the block in the histogram `name`."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - started, **labels)
+
+@contextmanager
+def stage(name):
+    """Records the wall time of a named stage of the run."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - started
+        with _lock:
+            _stages.append({'name': name, 'seconds': round(seconds, 6)})
+
+def enable_profiling(enabled=True):
+    global _profiling
+    _profiling = enabled
+
+@contextmanager
+def profile(name):
+    """Captures a cProfile of the block (calling thread only) when profiling is enabled.
+
+    The raw stats go to METRICS_DIR/<name>.prof and the top functions into the report.
+    """
+    # Only one profiler can be active per thread; nested blocks are covered by the outer one
+    if not _profiling or getattr(_active_profile, 'name', None):
+        yield
+        return
+    profiler = cProfile.Profile()
+    _active_profile.name = name
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        _active_profile.name = None
+        METRICS_DIR.mkdir(parents=True, exist_ok=True)
+        safe_name = re.sub(r'[^A-Za-z0-9_.-]+', '-', name)
+        profiler.dump_stats(METRICS_DIR / f"{safe_name}.prof")
+        stats = pstats.Stats(profiler, stream=io.StringIO())
+        top = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:PROFILE_TOP_FUNCTIONS]
+        with _lock:
+            _profiles[name] = {
+                'file': str(METRICS_DIR / f"{safe_name}.prof"),
+                'top_cumulative': [
+                    {
+                        'function': f"{os.path.basename(filename)}:{line}({function})",
+                        'calls': calls,
+                        'total_seconds': round(total_time, 6),
+                        'cumulative_seconds': round(cumulative_time, 6),
+                    }
+                    for (filename, line, function), (_, calls, total_time, cumulative_time, _) in top
+                ],
+            }
+
+def snapshot():
+    """The current metrics as a JSON-serializable dict."""
+    with _lock:
+        return {
+            'started_at': _started,
+            'wall_seconds': round(time.time() - _started, 6),
+            'stages': list(_stages),
+            'counters': [
+                {'name': name, 'labels': dict(labels), 'value': value}
+                for (name, labels), value in sorted(_counters.items())
+            ],
+            'histograms': [
+                {
+                    'name': name,
+                    'labels': dict(labels),
+                    'count': histogram['count'],
+                    'sum': round(histogram['sum'], 6),
+                    'buckets': dict(zip((str(bound) for bound in LATENCY_BUCKETS), histogram['buckets'])),
+                }
+                for (name, labels), histogram in sorted(_histograms.items())
+            ],
+            'profiles': dict(_profiles),
+        }
+
+def _format_labels(labels, extra=None):
+    pairs = list(labels) + (list(extra) if extra else [])
+    if not pairs:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + "}"
+
+def prometheus_text(run_name, data=None):
+    """Renders the metrics in the Prometheus text exposition format."""
+    data = data or snapshot()
+    lines = []
+    seen_types = set()
+
+    def declare(name, kind):
+        if name not in seen_types:
+            seen_types.add(name)
+            lines.append(f"# TYPE {name} {kind}")
+
+    run_label = [('run', run_name)]
+    declare("run_wall_seconds", "gauge")
+    lines.append(f"run_wall_seconds{_format_labels(run_label)} {data['wall_seconds']}")
+    declare("run_stage_seconds", "gauge")
+    for entry in data['stages']:
+        lines.append(f"run_stage_seconds{_format_labels(run_label, [('stage', entry['name'])])} {entry['seconds']}")
+    for counter in data['counters']:
+        declare(counter['name'], "counter")
+        labels = sorted(counter['labels'].items())
+        lines.append(f"{counter['name']}{_format_labels(run_label + labels)} {counter['value']}")
+    for histogram in data['histograms']:
+        name = histogram['name']
+        declare(name, "histogram")
+        labels = run_label + sorted(histogram['labels'].items())
+        for bound, count in histogram['buckets'].items():
+            lines.append(f"{name}_bucket{_format_labels(labels, [('le', bound)])} {count}")
+        lines.append(f"{name}_bucket{_format_labels(labels, [('le', '+Inf')])} {histogram['count']}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {histogram['sum']}")
+        lines.append(f"{name}_count{_format_labels(labels)} {histogram['count']}")
+    return "\n".join(lines) + "\n"
+
+def write_report(run_name, metrics_dir=None):
+    """Writes <run_name>.json and <run_name>.prom to the metrics directory; returns both paths."""
+    metrics_dir = Path(metrics_dir or METRICS_DIR)
+    metrics_dir.mkdir(parents=True, exist_ok=True)
+    data = snapshot()
+    data['run'] = run_name
+    json_path = metrics_dir / f"{run_name}.json"
+    prom_path = metrics_dir / f"{run_name}.prom"
+    for path, text in ((json_path, json.dumps(data, indent=2) + "\n"), (prom_path, prometheus_text(run_name, data))):
+        tmp_path = Path(f"{path}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+    print(f"Metrics written to {json_path} and {prom_path}")
+    return json_path, prom_path
+
+def write_report_at_exit(run_name):
+    """Writes the report when the process exits, including after sys.exit() or an exception."""
+    atexit.register(write_report, run_name)
@@ -1,9 +1,16 @@
 import os
-import requests
-import time
+import re
 import sys
 from dotenv import load_dotenv
 import json # Import json for error parsing
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+# run_metrics is shared with the font tooling at the project root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import run_metrics
+from bannerbear_client import BannerbearClient, BannerbearAPIError
+from bannerbear_snapshot import load_snapshot, save_snapshot, refresh_collection, upsert_item
 
 # Load environment variables from .env file
 load_dotenv()
@@ -11,9 +18,10 @@ load_dotenv()
 # --- Configuration ---
 # API Key is now loaded from the .env file (BANNERBEAR_API_KEY=...)
 BANNERBEAR_API_KEY = os.environ.get("BANNERBEAR_API_KEY")
-BASE_URL = "https://api.bannerbear.com/v2"
+# Overridable so the sync can target a local stand-in (see fake_bannerbear_server.py)
+BASE_URL = os.environ.get("BANNERBEAR_BASE_URL", "https://api.bannerbear.com/v2")
 
-# Range of Template Sets to process
+# Range of platform Template Sets to process (existing tenant sets are topped up as well)
 START_SET_NUMBER = 12 # Start from 12 now
 END_SET_NUMBER = 50 # Inclusive - Process up to 50
 
@@ -21,27 +29,46 @@ END_SET_NUMBER = 50 # Inclusive - Process up to 50
 NUM_DESIGN_TEMPLATES = 10
 NUM_STORY_TEMPLATES = 3
 
+# Upper bound for the adaptive rate limiter (requests per second)
+MAX_REQUESTS_PER_SECOND = float(os.environ.get("BANNERBEAR_MAX_RPS", 3.0))
+# Number of list pages requested ahead while earlier pages are being consumed
+PAGE_PREFETCH = 4
+# Concurrent create/update calls when applying a plan (still bounded by the rate limiter)
+APPLY_WORKERS = 4
+
+# "[<tenant>_]Template<n>_design<m>" / "..._Story<k>"; tenant prefixes come from duplicate-bulk.js
+TEMPLATE_NAME_RE = re.compile(r'^(?:(?P<tenant>[A-Za-z0-9_-]+?)_)?Template(?P<number>\d+)_(?P<kind>design|story)(?P<index>\d+)$', re.IGNORECASE)
+PLATFORM_SET_NAME_RE = re.compile(r'^Template Set (?P<number>\d+)$', re.IGNORECASE)
+# duplicate-bulk.js names sets "<tenant>_<base>_Set", where base may still carry the "_design1" suffix
+TENANT_SET_NAME_RE = re.compile(r'^(?P<tenant>[A-Za-z0-9_-]+?)_Template(?P<number>\d+)(?:_(?:design|story)\d+)?_Set$', re.IGNORECASE)
+
+_client = None
+
 # --- Helper Functions ---
 
+def get_client():
+    """Returns the shared pooled, rate-limited Bannerbear client."""
+    global _client
+    if _client is None:
+        _client = BannerbearClient(BANNERBEAR_API_KEY, BASE_URL, rate=MAX_REQUESTS_PER_SECOND)
+    return _client
+
 def make_request(method, endpoint, json_data=None):
     """Makes a request to the Bannerbear API and handles basic errors."""
     if not BANNERBEAR_API_KEY:
         print("Error: BANNERBEAR_API_KEY environment variable not set.", file=sys.stderr)
         sys.exit(1)
 
-    headers = {"Authorization": f"Bearer {BANNERBEAR_API_KEY}", "Content-Type": "application/json"}
     url = f"{BASE_URL}{endpoint}"
     try:
-        response = requests.request(method, url, headers=headers, json=json_data)
-        response.raise_for_status() # Raise an exception for bad status codes (4xx or 5xx)
+        response = get_client().request(method, endpoint, json_data=json_data)
         # Handle potential empty response body for successful PUT/DELETE etc.
         if response.status_code == 204: # No Content
             return True
         return response.json()
-    except requests.exceptions.RequestException as e:
+    except BannerbearAPIError as e:
         print(f"API Request Error ({method} {url}): {e}", file=sys.stderr)
-        error_message = str(e)
-        if hasattr(e, 'response') and e.response is not None:
+        if e.response is not None:
             try:
                 error_body = e.response.json()
                 error_message = error_body.get('message', e.response.text) 
@@ -53,52 +80,101 @@ def make_request(method, endpoint, json_data=None):
         print(f"An unexpected error occurred: {e}", file=sys.stderr)
         return None
 
-def list_all_paginated(endpoint):
-    """Fetches all items from a paginated Bannerbear API endpoint."""
-    results = []
-    page = 1
-    while True:
-        print(f"Fetching page {page} for {endpoint}...")
-        paginated_endpoint = f"{endpoint}?page={page}"
-        data = make_request("GET", paginated_endpoint)
-        if data is None:
-            return None
-        if not isinstance(data, list):
-            print(f"Error: Expected a list from {paginated_endpoint}, but got {type(data)}.", file=sys.stderr)
-            return None
-        if not data:
-            break
-        results.extend(data)
-        page += 1
-        time.sleep(0.5)
-    return results
-
-def get_all_templates():
-    """Gets a map of all template names to UIDs."""
-    print("Fetching all templates from Bannerbear...")
-    templates = list_all_paginated("/templates")
-    if templates is None:
+class PaginationError(Exception):
+    pass
+
+def iter_pages(endpoint, prefetch=PAGE_PREFETCH):
+    """Yields the pages of a paginated Bannerbear API endpoint as they arrive.
+
+    Up to `prefetch` pages are requested at once (all through the shared rate
+    limiter); iteration stops at the first empty page. Raises PaginationError
+    if a page cannot be fetched.
+    """
+    def fetch(page):
+        return make_request("GET", f"{endpoint}?page={page}")
+
+    executor = ThreadPoolExecutor(max_workers=prefetch)
+    pending = deque()
+    next_page = 1
+    try:
+        while True:
+            while len(pending) < prefetch:
+                pending.append((next_page, executor.submit(fetch, next_page)))
+                next_page += 1
+            page, future = pending.popleft()
+            data = future.result()
+            paginated_endpoint = f"{endpoint}?page={page}"
+            if data is None:
+                raise PaginationError(f"Failed to fetch {paginated_endpoint}.")
+            if not isinstance(data, list):
+                raise PaginationError(f"Expected a list from {paginated_endpoint}, but got {type(data)}.")
+            if not data:
+                return
+            print(f"Fetched page {page} for {endpoint} ({len(data)} items).")
+            yield data
+    finally:
+        # Drop prefetched pages past the end (or after an error / early exit)
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def list_all_paginated(endpoint, prefetch=PAGE_PREFETCH):
+    """Yields every item of a paginated Bannerbear API endpoint as pages arrive."""
+    for page in iter_pages(endpoint, prefetch):
+        yield from page
+
+def refresh_from_api(snapshot, key, endpoint, compact_item, full_resync):
+    # Incremental refreshes usually stop after the first page, so do not prefetch for them
+    return refresh_collection(
+        snapshot, key,
+        lambda full: iter_pages(endpoint, PAGE_PREFETCH if full else 1),
+        compact_item,
+        full=full_resync,
+    )
+
+def compact_template(t):
+    return {'uid': t['uid'], 'name': t['name'], 'updated_at': t.get('updated_at')}
+
+def compact_template_set(ts):
+    return {
+        'uid': ts['uid'],
+        'name': ts['name'],
+        'updated_at': ts.get('updated_at'),
+        'templates': [t['uid'] for t in ts.get('templates', []) if 'uid' in t],
+    }
+
+def get_all_templates(snapshot, full_resync=False):
+    """Gets a map of all template names to UIDs, refreshing the local snapshot first."""
+    print("Fetching templates from Bannerbear...")
+    try:
+        templates = refresh_from_api(snapshot, 'templates', "/templates", compact_template, full_resync)
+    except PaginationError as e:
+        print(f"Error: {e}", file=sys.stderr)
         print("Error: Failed to fetch templates.", file=sys.stderr)
         return None
-    print(f"Successfully fetched {len(templates)} templates.")
-    return {t['name']: t['uid'] for t in templates if 'name' in t and 'uid' in t}
+    print(f"Successfully loaded {len(templates)} templates.")
+    return {t['name']: t['uid'] for t in templates}
 
-def get_all_template_sets():
+def get_all_template_sets(snapshot, full_resync=False):
     """Gets a map of all template set names to their data (uid, template_uids)."""
-    print("Fetching all template sets from Bannerbear...")
-    template_sets = list_all_paginated("/template_sets")
-    if template_sets is None:
+    print("Fetching template sets from Bannerbear...")
+    try:
+        template_sets = refresh_from_api(snapshot, 'template_sets', "/template_sets", compact_template_set, full_resync)
+    except PaginationError as e:
+        print(f"Error: {e}", file=sys.stderr)
         print("Error: Failed to fetch template sets.", file=sys.stderr)
         return None
-    print(f"Successfully fetched {len(template_sets)} template sets.")
+    print(f"Successfully loaded {len(template_sets)} template sets.")
     return {
-        ts['name']: {
-            'uid': ts['uid'],
-            'templates': [t['uid'] for t in ts.get('templates', []) if 'uid' in t]
-         }
-        for ts in template_sets if 'name' in ts and 'uid' in ts
+        ts['name']: {'uid': ts['uid'], 'templates': list(ts['templates'])}
+        for ts in template_sets
     }
 
+def fetch_template_set(template_set_uid):
+    """Gets the current template UIDs of one set from the API, or None if it cannot be fetched (e.g. deleted)."""
+    result = make_request("GET", f"/template_sets/{template_set_uid}")
+    if not isinstance(result, dict) or 'uid' not in result:
+        return None
+    return compact_template_set(result)['templates']
+
 def update_template_set(template_set_uid, template_uids_to_add):
     """Updates an existing template set using the PUT endpoint."""
     endpoint = f"/template_sets/{template_set_uid}"
@@ -132,97 +208,232 @@ def create_template_set(name, template_uids):
         print(f"Failed to create template set '{name}'.", file=sys.stderr)
         return None
 
+# --- Plan / Apply ---
+def parse_template_name(name):
+    """Parses "[<tenant>_]Template<n>_design<m>" / "..._Story<k>" into (tenant, set number, kind, index).
+
+    tenant is None for the platform templates; kind is "design" or "story".
+    Returns None for names that do not follow the convention.
+    """
+    match = TEMPLATE_NAME_RE.match(name)
+    if not match:
+        return None
+    return match.group('tenant'), int(match.group('number')), match.group('kind').lower(), int(match.group('index'))
+
+def parse_set_name(name):
+    """Returns (tenant, set number) for "Template Set <n>" and "<tenant>_Template<n>..._Set" names, else None."""
+    match = PLATFORM_SET_NAME_RE.match(name)
+    if match:
+        return None, int(match.group('number'))
+    match = TENANT_SET_NAME_RE.match(name)
+    if match:
+        return match.group('tenant'), int(match.group('number'))
+    return None
+
+def set_name_for(tenant, set_number):
+    if tenant is None:
+        return f"Template Set {set_number}"
+    # The name pages/api/templates/duplicate-bulk.js gives the set: its base-name regex keeps
+    # the first template's "_design1" suffix
+    return f"{tenant}_Template{set_number}_design1_Set"
+
+def build_template_index(template_name_to_uid):
+    """Groups every conventionally named template by (tenant, set number) in one pass.
+
+    Returns {(tenant, set number): {(kind, index): uid}}.
+    """
+    index = {}
+    for name, uid in template_name_to_uid.items():
+        parsed = parse_template_name(name)
+        if parsed is None:
+            continue
+        tenant, set_number, kind, template_index = parsed
+        index.setdefault((tenant, set_number), {})[(kind, template_index)] = uid
+    return index
+
+def build_set_index(set_name_to_data):
+    """Maps (tenant, set number) to (name, data) of the existing set, preferring the canonical name."""
+    index = {}
+    for name, data in set_name_to_data.items():
+        parsed = parse_set_name(name)
+        if parsed is None:
+            continue
+        if parsed not in index or name == set_name_for(*parsed):
+            index[parsed] = (name, data)
+    return index
+
+def required_templates_for_set(templates):
+    """Returns (template UIDs in set order, expected template keys missing) for one indexed group."""
+    expected = [("design", n) for n in range(1, NUM_DESIGN_TEMPLATES + 1)]
+    expected += [("story", n) for n in range(1, NUM_STORY_TEMPLATES + 1)]
+    # Designs before stories, each by number; numbers beyond the constants are not part of the set
+    required_template_uids = [templates[key] for key in expected if key in templates]
+    missing = [key for key in expected if key not in templates]
+    return required_template_uids, missing
+
+def describe_template(tenant, set_number, key):
+    kind, template_index = key
+    name = f"Template{set_number}_{'design' if kind == 'design' else 'Story'}{template_index}"
+    return name if tenant is None else f"{tenant}_{name}"
+
+def merge_tenant_templates(current_templates, group_template_uids):
+    # Keep the user's selection as it is and append what the group is missing
+    return current_templates + [uid for uid in group_template_uids if uid not in current_templates]
+
+def plan_template_sets(template_name_to_uid, set_name_to_data):
+    """Computes what every platform and tenant set needs, without any API writes.
+
+    Platform sets START_SET_NUMBER..END_SET_NUMBER are created or set to exactly their
+    templates. Tenant sets belong to the app (duplicate-bulk.js creates them from a user's
+    selection and records their IDs in DynamoDB), so they are never created and only get
+    their group's missing templates added; nothing already in them is removed. Each entry
+    has an 'action' of "create", "update", "noop" or "skip" (no templates found).
+    """
+    template_index = build_template_index(template_name_to_uid)
+    set_index = build_set_index(set_name_to_data)
+
+    groups = {key for key in set_index if key[0] is not None}
+    groups.update((None, n) for n in range(START_SET_NUMBER, END_SET_NUMBER + 1))
+
+    plan = []
+    for tenant, set_number in sorted(groups, key=lambda key: (key[0] is not None, key[0] or "", key[1])):
+        templates = template_index.get((tenant, set_number), {})
+        group_template_uids, missing = required_templates_for_set(templates)
+        required_template_uids = group_template_uids
+        existing = set_index.get((tenant, set_number))
+        target_set_data = existing[1] if existing else None
+        current_templates = list(target_set_data.get('templates', [])) if target_set_data else []
+        if tenant is not None:
+            required_template_uids = merge_tenant_templates(current_templates, group_template_uids)
+        entry = {
+            'tenant': tenant,
+            'set_number': set_number,
+            'name': existing[0] if existing else set_name_for(tenant, set_number),
+            'uid': target_set_data['uid'] if target_set_data else None,
+            'templates': required_template_uids,
+            'group_templates': group_template_uids,
+            'current_templates': current_templates,
+            'missing_templates': [describe_template(tenant, set_number, key) for key in missing],
+        }
+        if not required_template_uids:
+            entry['action'] = "skip"
+        elif not target_set_data:
+            entry['action'] = "create"
+        elif set(required_template_uids) == set(current_templates):
+            entry['action'] = "noop"
+        else:
+            entry['action'] = "update"
+        plan.append(entry)
+    return plan
+
+def print_plan(plan):
+    for entry in plan:
+        name = entry['name']
+        if entry['missing_templates'] and entry['action'] != "skip":
+            print(f"Warning: '{name}' is missing {len(entry['missing_templates'])} templates: "
+                  f"{', '.join(entry['missing_templates'])}", file=sys.stderr)
+        if entry['action'] == "skip":
+            print(f"'{name}': skip (no required templates found)")
+        elif entry['action'] == "create":
+            print(f"'{name}': create with {len(entry['templates'])} templates")
+        elif entry['action'] == "update":
+            print(f"'{name}': update {entry['uid']} ({len(entry['current_templates'])} -> {len(entry['templates'])} templates)")
+    counts = {}
+    for entry in plan:
+        counts[entry['action']] = counts.get(entry['action'], 0) + 1
+    tenants = {entry['tenant'] for entry in plan if entry['tenant'] is not None}
+    print(f"Plan for {len(plan)} sets ({len(tenants)} tenants): " + ", ".join(f"{counts.get(action, 0)} {action}" for action in ("create", "update", "noop", "skip")))
+
+def apply_entry(entry):
+    """Runs the API write for a plan entry; returns (set UID, templates written) on success, else None.
+
+    The plan may come from a snapshot up to SNAPSHOT_MAX_AGE old, so a set is re-fetched
+    right before it is updated: deleted sets are not written, and the update is recomputed
+    from the set's current templates.
+    """
+    if entry['action'] == "create":
+        new_set_data = create_template_set(entry['name'], entry['templates'])
+        return (new_set_data['uid'], entry['templates']) if new_set_data else None
+    current_templates = fetch_template_set(entry['uid'])
+    if current_templates is None:
+        print(f"Template set '{entry['name']}' ({entry['uid']}) could not be fetched; it may have been deleted. "
+              f"Re-run with --full-resync.", file=sys.stderr)
+        return None
+    if entry['tenant'] is None:
+        templates = entry['templates']
+    else:
+        templates = merge_tenant_templates(current_templates, entry['group_templates'])
+    if set(templates) == set(current_templates):
+        print(f"Template set '{entry['name']}' is already up to date.")
+        return entry['uid'], current_templates
+    if update_template_set(entry['uid'], templates):
+        return entry['uid'], templates
+    return None
+
+def apply_plan(plan, snapshot, workers=APPLY_WORKERS):
+    """Runs the plan's creates and updates across a worker pool (all calls share the rate limiter).
+
+    Returns the number of failed writes.
+    """
+    changes = [entry for entry in plan if entry['action'] in ("create", "update")]
+    if not changes:
+        print("All template sets are up to date.")
+        return 0
+    print(f"\nApplying {len(changes)} changes with {workers} workers...")
+    failures = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for entry, result in zip(changes, executor.map(apply_entry, changes)):
+            run_metrics.inc("template_set_writes_total", action=entry['action'], result="failed" if result is None else "ok")
+            if result is None:
+                failures += 1
+                print(f"Failed to {entry['action']} '{entry['name']}'.", file=sys.stderr)
+                continue
+            set_uid, templates = result
+            upsert_item(snapshot, 'template_sets', {
+                'uid': set_uid, 'name': entry['name'], 'updated_at': None,
+                'templates': list(templates),
+            })
+    return failures
+
 # --- Main Logic ---
-def main():
-    template_name_to_uid = get_all_templates()
+def main(full_resync=False, dry_run=False, plan_json=None, workers=APPLY_WORKERS):
+    snapshot = load_snapshot()
+    with run_metrics.stage("list-templates"), run_metrics.profile("list-templates"):
+        template_name_to_uid = get_all_templates(snapshot, full_resync)
     if template_name_to_uid is None:
         sys.exit(1)
 
-    set_name_to_data = get_all_template_sets()
+    with run_metrics.stage("list-template-sets"), run_metrics.profile("list-template-sets"):
+        set_name_to_data = get_all_template_sets(snapshot, full_resync)
     if set_name_to_data is None:
         sys.exit(1)
+    save_snapshot(snapshot)
+    run_metrics.inc("bannerbear_templates_listed_total", len(template_name_to_uid))
+    run_metrics.inc("bannerbear_template_sets_listed_total", len(set_name_to_data))
 
-    print(f"\nStarting process for Template Sets {START_SET_NUMBER} to {END_SET_NUMBER}...")
-
-    for set_number in range(START_SET_NUMBER, END_SET_NUMBER + 1):
-        print(f"\n--- Processing Template Set {set_number} ---")
-        target_set_name = f"Template Set {set_number}"
-
-        # 1. Determine required template UIDs for this set number
-        required_template_uids = []
-        missing_template_names = []
-
-        # Find design templates
-        for design_number in range(1, NUM_DESIGN_TEMPLATES + 1):
-            template_name = f"Template{set_number}_design{design_number}"
-            template_uid = template_name_to_uid.get(template_name)
-            if template_uid:
-                required_template_uids.append(template_uid)
-            else:
-                missing_template_names.append(template_name)
-
-        # Find story templates
-        for story_number in range(1, NUM_STORY_TEMPLATES + 1):
-            template_name = f"Template{set_number}_Story{story_number}"
-            template_uid = template_name_to_uid.get(template_name)
-            if template_uid:
-                required_template_uids.append(template_uid)
-            else:
-                missing_template_names.append(template_name)
-        
-        # Report any missing templates upfront
-        if missing_template_names:
-            print(f"Warning: The following required templates were not found in your Bannerbear account for Set {set_number}:", file=sys.stderr)
-            for name in missing_template_names:
-                print(f"  - {name}", file=sys.stderr)
-            # Decide if we should continue without these templates or skip the set
-            if not required_template_uids: 
-                print(f"Skipping Set {set_number} as NO required templates were found.", file=sys.stderr)
-                continue
-            else:
-                 print(f"Continuing with {len(required_template_uids)} found templates for Set {set_number}.")
-
-        # Convert to sets for easier comparison
-        required_uids_set = set(required_template_uids)
-
-        # 2. Check if the template set exists
-        target_set_data = set_name_to_data.get(target_set_name)
-
-        if not target_set_data:
-            # 3a. Set does not exist - Create it with the required templates
-            print(f"Template Set '{target_set_name}' not found. Creating it now.")
-            new_set_data = create_template_set(target_set_name, required_template_uids)
-            if new_set_data:
-                # Add to our cache in case it's needed later (though unlikely in this script structure)
-                set_name_to_data[target_set_name] = new_set_data
-                print(f"Successfully created and populated Template Set {set_number}.")
-            else:
-                print(f"Failed to create Template Set {set_number}. Skipping.", file=sys.stderr)
-                # Optional: Stop script on error
-                # sys.exit(1)
-        else:
-            # 3b. Set exists - Check if update is needed
-            target_set_uid = target_set_data['uid']
-            existing_uids_set = set(target_set_data.get('templates', []))
-            print(f"Template Set '{target_set_name}' (UID: {target_set_uid}) found with {len(existing_uids_set)} templates.")
-
-            if required_uids_set == existing_uids_set:
-                print(f"Template Set {set_number} already contains the correct {len(required_uids_set)} templates. No update needed.")
-            else:
-                print(f"Template Set {set_number} needs updating. (Found {len(existing_uids_set)}, requires {len(required_uids_set)}) Ensuring it has the correct {len(required_uids_set)} templates.")
-                success = update_template_set(target_set_uid, required_template_uids)
-                if success:
-                    print(f"Successfully updated Template Set {set_number}.")
-                else:
-                    print(f"Error updating Template Set {set_number}.", file=sys.stderr)
-                    # Optional: Stop script on error
-                    # sys.exit(1)
-
-        # Add a delay before processing the next set (if any)
-        if set_number < END_SET_NUMBER:
-             print("Waiting 1 second before next set...")
-             time.sleep(1)
+    print(f"\nPlanning Template Sets {START_SET_NUMBER} to {END_SET_NUMBER} and the existing tenant sets...")
+    with run_metrics.stage("plan"), run_metrics.profile("plan"):
+        plan = plan_template_sets(template_name_to_uid, set_name_to_data)
+    print_plan(plan)
+    for entry in plan:
+        run_metrics.inc("template_set_plan_total", action=entry['action'])
 
+    if plan_json == "-" or (dry_run and plan_json is None):
+        print(json.dumps(plan, indent=2))
+    elif plan_json:
+        with open(plan_json, "w", encoding="utf-8") as f:
+            json.dump(plan, f, indent=2)
+        print(f"Wrote plan to {plan_json}")
+    if dry_run:
+        print("\n--- Dry run, no changes made ---")
+        return
+
+    with run_metrics.stage("apply"):
+        failures = apply_plan(plan, snapshot, workers)
+    save_snapshot(snapshot)
+    if failures:
+        print(f"\n--- Script finished with {failures} failed changes ---", file=sys.stderr)
+        sys.exit(1)
     print("\n--- Script finished ---")
 
 if __name__ == "__main__":
@@ -239,10 +450,28 @@ if __name__ == "__main__":
         # Fallback if .env is in the same directory as the script
         load_dotenv()
 
+    import argparse
+    parser = argparse.ArgumentParser(description="Create or update Bannerbear template sets from the account's templates.")
+    parser.add_argument("--full-resync", action="store_true",
+                        help="Re-list the whole account instead of refreshing the local snapshot incrementally")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Only compute the plan and print it as JSON; make no changes")
+    parser.add_argument("--plan-json", default=None,
+                        help="Write the plan as JSON to this file ('-' for stdout)")
+    parser.add_argument("--workers", type=int, default=APPLY_WORKERS,
+                        help="Concurrent create/update calls when applying")
+    parser.add_argument("--profile", action="store_true",
+                        help="Capture cProfile data for the listing and planning phases in the metrics report")
+    args = parser.parse_args()
+    if args.profile:
+        run_metrics.enable_profiling()
+    # JSON and Prometheus metrics for the run, also written when the script exits early
+    run_metrics.write_report_at_exit("add_templates_to_sets")
+
     # Re-check API key after loading .env
     BANNERBEAR_API_KEY = os.environ.get("BANNERBEAR_API_KEY")
     if not BANNERBEAR_API_KEY:
         print("Error: BANNERBEAR_API_KEY not found in environment variables or .env file.", file=sys.stderr)
         sys.exit(1)
 
-    main() 
\ No newline at end of file
+    main(full_resync=args.full_resync, dry_run=args.dry_run, plan_json=args.plan_json, workers=args.workers) 
\ No newline at end of file
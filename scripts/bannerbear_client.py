@@ -0,0 +1,186 @@
+import random
+import re
+import sys
+import threading
+import time
+
+import requests
+import urllib3
+from requests.adapters import HTTPAdapter
+
+# run_metrics is shared with the font tooling at the project root (put on sys.path by add_templates_to_sets.py)
+import run_metrics
+
+# Bannerbear allows roughly 30 requests per 10 seconds per API key
+DEFAULT_RATE = 3.0   # requests per second the limiter starts at and never exceeds
+DEFAULT_BURST = 10   # tokens that can be spent back to back
+MIN_RATE = 0.5
+
+MAX_RETRIES = 5
+BACKOFF_BASE = 0.5   # seconds; doubled per attempt, with full jitter
+BACKOFF_CAP = 30.0
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+# A POST (creating a set) may already have taken effect when it fails with a 5xx or a dropped
+# connection, so it is only retried after a 429 or when it never reached the server
+IDEMPOTENT_METHODS = {"GET", "HEAD", "PUT", "DELETE", "OPTIONS"}
+REQUEST_TIMEOUT = (10, 60)  # seconds to connect, and between bytes of the response
+
+# Metric label for an endpoint: query string dropped and UIDs collapsed, e.g. "/template_sets/{uid}"
+ENDPOINT_UID_RE = re.compile(r'/(?=[A-Za-z0-9]*\d)[A-Za-z0-9]{8,}(?=/|$)')
+
+def endpoint_label(endpoint):
+    return ENDPOINT_UID_RE.sub("/{uid}", endpoint.split("?", 1)[0])
+
+class BannerbearAPIError(Exception):
+    """Raised when a request still fails after all retries (or fails with a non-retryable status)."""
+    def __init__(self, message, response=None):
+        super().__init__(message)
+        self.response = response
+
+class RateLimiter:
+    """Thread-safe token bucket that adapts its rate to the API's feedback.
+
+    A 429 halves the rate and pauses every caller until Retry-After has passed;
+    each success nudges the rate back up towards max_rate (AIMD). When the API
+    sends X-RateLimit-Remaining/-Reset headers the rate follows them directly.
+    """
+    def __init__(self, max_rate=DEFAULT_RATE, burst=DEFAULT_BURST):
+        self.max_rate = max_rate
+        self.rate = max_rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self.paused_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = max(self.paused_until - now, (1 - self.tokens) / self.rate)
+            time.sleep(wait)
+
+    def on_success(self, headers):
+        with self.lock:
+            if not self._follow_headers(headers):
+                self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+
+    def on_throttled(self, retry_after):
+        with self.lock:
+            self.rate = max(MIN_RATE, self.rate / 2)
+            self.tokens = 0
+            self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+
+    def _follow_headers(self, headers):
+        remaining = headers.get('X-RateLimit-Remaining')
+        reset = headers.get('X-RateLimit-Reset')
+        if remaining is None or reset is None:
+            return False
+        try:
+            remaining = int(remaining)
+            reset = float(reset)
+        except ValueError:
+            return False
+        # Reset may be an epoch timestamp or a number of seconds
+        window = reset - time.time() if reset > 1e9 else reset
+        if window <= 0:
+            return False
+        self.rate = max(MIN_RATE, min(self.max_rate, remaining / window))
+        return True
+
+def parse_retry_after(response):
+    value = response.headers.get('Retry-After') if response is not None else None
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return None
+
+def never_sent(error):
+    """True if a request failed before any of it reached the server."""
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], 'reason', None) if error.args else None
+    return isinstance(reason, urllib3.exceptions.NewConnectionError)
+
+def backoff_delay(attempt):
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * (2 ** attempt)))
+
+class BannerbearClient:
+    """Pooled keep-alive session shared by every call, behind the adaptive rate limiter."""
+    def __init__(self, api_key, base_url, rate=DEFAULT_RATE, burst=DEFAULT_BURST,
+                 max_retries=MAX_RETRIES, pool_size=10, timeout=REQUEST_TIMEOUT):
+        self.base_url = base_url
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.limiter = RateLimiter(rate, burst)
+        self.session = requests.Session()
+        self.session.headers.update({"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"})
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.retries = 0
+        self.throttled = 0
+
+    def request(self, method, endpoint, json_data=None):
+        """Sends a request, retrying 429/5xx and connection errors with jittered backoff.
+
+        Non-idempotent methods (POST) are retried only after a 429 or a failure to connect.
+        Returns the successful Response; raises BannerbearAPIError otherwise.
+        """
+        url = f"{self.base_url}{endpoint}"
+        label = endpoint_label(endpoint)
+        idempotent = method.upper() in IDEMPOTENT_METHODS
+        for attempt in range(self.max_retries + 1):
+            with run_metrics.timed("bannerbear_rate_limit_wait_seconds"):
+                self.limiter.acquire()
+            started = time.perf_counter()
+            try:
+                response = self.session.request(method, url, json=json_data, timeout=self.timeout)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                run_metrics.observe("bannerbear_request_seconds", time.perf_counter() - started,
+                                    method=method, endpoint=label, status="error")
+                if attempt == self.max_retries or not (idempotent or never_sent(e)):
+                    raise BannerbearAPIError(f"{method} {url} failed: {e}")
+                delay = backoff_delay(attempt)
+                print(f"Connection error on {method} {url} ({e}); retrying in {delay:.1f}s", file=sys.stderr)
+                self.retries += 1
+                run_metrics.inc("bannerbear_retries_total", reason="connection")
+                time.sleep(delay)
+                continue
+
+            run_metrics.observe("bannerbear_request_seconds", time.perf_counter() - started,
+                                method=method, endpoint=label, status=response.status_code)
+            run_metrics.inc("bannerbear_responses_total", method=method, endpoint=label, status=response.status_code)
+            run_metrics.inc("bannerbear_bytes_received_total", len(response.content))
+            if response.request.body:
+                run_metrics.inc("bannerbear_bytes_sent_total", len(response.request.body))
+            retryable = response.status_code == 429 or (idempotent and response.status_code in RETRY_STATUS_CODES)
+            if not retryable:
+                if response.ok:
+                    self.limiter.on_success(response.headers)
+                    return response
+                raise BannerbearAPIError(f"{method} {url} returned {response.status_code}", response)
+
+            if attempt == self.max_retries:
+                raise BannerbearAPIError(f"{method} {url} returned {response.status_code} after {attempt} retries", response)
+            delay = backoff_delay(attempt)
+            if response.status_code == 429:
+                self.throttled += 1
+                run_metrics.inc("bannerbear_throttled_total")
+                retry_after = parse_retry_after(response)
+                delay = max(delay, retry_after if retry_after is not None else BACKOFF_BASE)
+                self.limiter.on_throttled(delay)
+            print(f"{method} {url} returned {response.status_code}; retrying in {delay:.1f}s", file=sys.stderr)
+            self.retries += 1
+            run_metrics.inc("bannerbear_retries_total", reason=str(response.status_code))
+            time.sleep(delay)
@@ -0,0 +1,83 @@
+import json
+import os
+import time
+
+# Local copy of the account's templates and template sets, so repeat runs only fetch what changed
+SNAPSHOT_FILE = os.environ.get("BANNERBEAR_SNAPSHOT_FILE") or os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".bannerbear_snapshot.json")
+SNAPSHOT_VERSION = 1
+# Lists are ordered by creation, so incremental refreshes cannot see deletions or edits past the
+# first pages; force a full resync this often (add_templates_to_sets.py re-fetches every set it writes)
+SNAPSHOT_MAX_AGE = 24 * 60 * 60  # seconds
+
+def empty_snapshot():
+    return {'version': SNAPSHOT_VERSION, 'collections': {}}
+
+def load_snapshot(path=SNAPSHOT_FILE):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            snapshot = json.load(f)
+    except (OSError, ValueError):
+        return empty_snapshot()
+    if snapshot.get('version') != SNAPSHOT_VERSION:
+        return empty_snapshot()
+    return snapshot
+
+def save_snapshot(snapshot, path=SNAPSHOT_FILE):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(snapshot, f, separators=(",", ":"))
+    os.replace(tmp_path, path)
+
+def refresh_collection(snapshot, key, iter_pages, compact_item, full=False):
+    """Brings snapshot['collections'][key] up to date and returns its items (API order).
+
+    iter_pages(full) yields lists of raw API items, newest created first. A full resync replaces
+    the collection. An incremental refresh stops at the first page whose items are
+    all already known with the same updated_at, and keeps the rest from the snapshot.
+    compact_item turns a raw item into the dict stored in the snapshot.
+    """
+    collection = snapshot['collections'].get(key)
+    now = time.time()
+    if collection is None or now - collection.get('full_synced_at', 0) > SNAPSHOT_MAX_AGE:
+        full = True
+    known = {} if full else {item['uid']: item for item in collection['items']}
+
+    fetched = []
+    requests_made = 0
+    for page in iter_pages(full):
+        requests_made += 1
+        changed = False
+        for raw in page:
+            if 'uid' not in raw or 'name' not in raw:
+                continue
+            item = compact_item(raw)
+            previous = known.get(item['uid'])
+            if previous is None or previous.get('updated_at') != item.get('updated_at'):
+                changed = True
+            fetched.append(item)
+        if not full and not changed:
+            break
+
+    fetched_uids = {item['uid'] for item in fetched}
+    items = fetched + [item for uid, item in known.items() if uid not in fetched_uids]
+    snapshot['collections'][key] = {
+        'synced_at': now,
+        'full_synced_at': now if full else collection['full_synced_at'],
+        'items': items,
+    }
+    mode = "Full resync" if full else "Incremental refresh"
+    print(f"{mode} of {key}: {requests_made} pages fetched, {len(items)} items in snapshot.")
+    return items
+
+def upsert_item(snapshot, key, item):
+    """Records a change we made ourselves in the snapshot: created items go first, updated ones keep their place."""
+    collection = snapshot['collections'].get(key)
+    if collection is None:
+        return
+    items = collection['items']
+    for i, existing in enumerate(items):
+        if existing['uid'] == item['uid']:
+            items[i] = item
+            return
+    items.insert(0, item)
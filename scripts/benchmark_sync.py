@@ -0,0 +1,84 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from fake_bannerbear_server import FakeBannerbear, populate_account
+
+# Runs add_templates_to_sets.py against the local stand-in API at several account sizes
+SYNC_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "add_templates_to_sets.py")
+DEFAULT_SIZES = [100, 1000, 10000]
+
+def run_sync(base_url, tmp_dir, max_rps, extra_args=()):
+    env = dict(os.environ)
+    env.update({
+        'BANNERBEAR_BASE_URL': base_url,
+        'BANNERBEAR_API_KEY': "fake",
+        'BANNERBEAR_SNAPSHOT_FILE': os.path.join(tmp_dir, "snapshot.json"),
+        'BANNERBEAR_MAX_RPS': str(max_rps),
+        # Keep the run's metrics reports out of the repository's .metrics
+        'RUN_METRICS_DIR': os.path.join(tmp_dir, ".metrics"),
+    })
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, SYNC_SCRIPT, *extra_args], env=env, capture_output=True, text=True)
+    elapsed = time.perf_counter() - started
+    if result.returncode != 0:
+        print(result.stdout[-2000:], file=sys.stderr)
+        print(result.stderr[-2000:], file=sys.stderr)
+    return elapsed, result.returncode
+
+def benchmark_size(num_templates, latency, rate_limit, failure_rate, max_rps):
+    """Cold sync (no snapshot), then a warm sync with nothing to change."""
+    fake = FakeBannerbear(latency=latency, rate_limit=rate_limit, failure_rate=failure_rate, seed=num_templates)
+    groups = populate_account(fake, num_templates)
+    base_url = fake.start()
+    results = []
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for run in ("cold", "warm"):
+                fake.reset_counts()
+                elapsed, returncode = run_sync(base_url, tmp_dir, max_rps)
+                counts = dict(fake.counts)
+                results.append({
+                    'templates': len(fake.templates),
+                    'groups': groups,
+                    'run': run,
+                    'seconds': round(elapsed, 3),
+                    'requests': counts['requests'],
+                    'reads': counts['GET'],
+                    'writes': counts['POST'] + counts['PUT'],
+                    # Every 429, and every injected 500 except on a POST, is answered by exactly one client retry
+                    'retries': counts['throttled'] + counts['failed'] - counts['failed_POST'],
+                    'exit_code': returncode,
+                })
+    finally:
+        fake.stop()
+    return results
+
+def print_table(rows):
+    columns = ['templates', 'run', 'seconds', 'requests', 'reads', 'writes', 'retries', 'exit_code']
+    print(" ".join(f"{column:>10}" for column in columns))
+    for row in rows:
+        print(" ".join(f"{row[column]:>10}" for column in columns))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the Bannerbear template set sync against a local fake API.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Account sizes (number of templates)")
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds the fake adds to every response")
+    parser.add_argument("--rate-limit", type=float, default=None, help="Fake server limit in requests/second (429 above it)")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Fraction of requests the fake fails with a 500")
+    parser.add_argument("--max-rps", type=float, default=3.0, help="Client-side request rate ceiling for the sync")
+    parser.add_argument("--json", dest="json_path", default=None, help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    rows = []
+    for size in args.sizes:
+        print(f"Benchmarking {size} templates...", file=sys.stderr)
+        rows.extend(benchmark_size(size, args.latency, args.rate_limit, args.failure_rate, args.max_rps))
+    print_table(rows)
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
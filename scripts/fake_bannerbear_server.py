@@ -0,0 +1,245 @@
+import argparse
+import json
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+# Local stand-in for the parts of the Bannerbear v2 API that add_templates_to_sets.py uses:
+#   GET /v2/templates, GET /v2/template_sets (paginated, newest created first),
+#   GET /v2/template_sets/<uid>, POST /v2/template_sets, PUT /v2/template_sets/<uid>
+API_PREFIX = "/v2"
+DEFAULT_PAGE_SIZE = 25
+
+def now_iso():
+    return datetime.now(timezone.utc).isoformat()
+
+class FakeBannerbear:
+    """In-memory account plus request counters, served over HTTP on localhost.
+
+    latency: seconds added to every response.
+    rate_limit: requests per second allowed before answering 429 with Retry-After (None = unlimited).
+    failure_rate: fraction of requests answered with a 500.
+    """
+    def __init__(self, latency=0.0, rate_limit=None, burst=10, failure_rate=0.0, page_size=DEFAULT_PAGE_SIZE, seed=None):
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.burst = burst
+        self.failure_rate = failure_rate
+        self.page_size = page_size
+        self.random = random.Random(seed)
+        self.templates = []      # newest created first
+        self.template_sets = []  # newest created first; edits keep their place
+        self.counts = {'requests': 0, 'GET': 0, 'POST': 0, 'PUT': 0, 'throttled': 0, 'failed': 0, 'failed_POST': 0}
+        self.lock = threading.Lock()
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._next_uid = 0
+        self.server = None
+
+    # --- Account setup ---
+
+    def new_uid(self, prefix):
+        with self.lock:
+            self._next_uid += 1
+            return f"{prefix}{self._next_uid:08d}"
+
+    def add_template(self, name):
+        template = {'uid': self.new_uid("tpl"), 'name': name, 'updated_at': now_iso()}
+        with self.lock:
+            self.templates.insert(0, template)
+        return template
+
+    def add_template_set(self, name, template_uids):
+        template_set = {
+            'uid': self.new_uid("set"),
+            'name': name,
+            'updated_at': now_iso(),
+            'templates': [{'uid': uid} for uid in template_uids],
+        }
+        with self.lock:
+            self.template_sets.insert(0, template_set)
+        return template_set
+
+    def reset_counts(self):
+        with self.lock:
+            for key in self.counts:
+                self.counts[key] = 0
+
+    # --- Request handling ---
+
+    def _admit(self, method):
+        """Returns None to serve the request, or the HTTP error (status, retry_after) to answer with."""
+        with self.lock:
+            self.counts['requests'] += 1
+            if self.rate_limit:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate_limit)
+                self._updated = now
+                if self._tokens < 1:
+                    self.counts['throttled'] += 1
+                    return 429, (1 - self._tokens) / self.rate_limit
+                self._tokens -= 1
+            if self.failure_rate and self.random.random() < self.failure_rate:
+                self.counts['failed'] += 1
+                if method == "POST":
+                    self.counts['failed_POST'] += 1
+                return 500, None
+        return None
+
+    def list_page(self, items, query):
+        page = int(query.get('page', ['1'])[0])
+        limit = int(query.get('limit', [str(self.page_size)])[0])
+        with self.lock:
+            return items[(page - 1) * limit:page * limit]
+
+    def find_set(self, uid):
+        for template_set in self.template_sets:
+            if template_set['uid'] == uid:
+                return template_set
+        return None
+
+    def handle(self, method, path, body):
+        """Returns (status, payload, headers) for one request."""
+        error = self._admit(method)
+        if self.latency:
+            time.sleep(self.latency)
+        if error:
+            status, retry_after = error
+            headers = {'Retry-After': f"{retry_after:.2f}"} if retry_after is not None else {}
+            return status, {'message': "Rate limit exceeded" if status == 429 else "Internal error"}, headers
+        with self.lock:
+            self.counts[method] = self.counts.get(method, 0) + 1
+
+        url = urlparse(path)
+        if not url.path.startswith(API_PREFIX):
+            return 404, {'message': "Not found"}, {}
+        route = url.path[len(API_PREFIX):].rstrip("/")
+        query = parse_qs(url.query)
+
+        if method == "GET" and route == "/templates":
+            return 200, self.list_page(self.templates, query), {}
+        if method == "GET" and route == "/template_sets":
+            return 200, self.list_page(self.template_sets, query), {}
+        if method == "GET" and route.startswith("/template_sets/"):
+            with self.lock:
+                template_set = self.find_set(route.rsplit("/", 1)[1])
+            if template_set is None:
+                return 404, {'message': "Template set not found"}, {}
+            return 200, template_set, {}
+        if method == "POST" and route == "/template_sets":
+            if not body or 'name' not in body:
+                return 400, {'message': "name is required"}, {}
+            return 200, self.add_template_set(body['name'], body.get('templates', [])), {}
+        if method == "PUT" and route.startswith("/template_sets/"):
+            with self.lock:
+                template_set = self.find_set(route.rsplit("/", 1)[1])
+                if template_set is None:
+                    return 404, {'message': "Template set not found"}, {}
+                template_set['templates'] = [{'uid': uid} for uid in (body or {}).get('templates', [])]
+                template_set['updated_at'] = now_iso()
+            return 200, template_set, {}
+        return 404, {'message': "Not found"}, {}
+
+    # --- Server lifecycle ---
+
+    def start(self, host="127.0.0.1", port=0):
+        """Serves in a background thread; returns the base URL to use as BANNERBEAR_BASE_URL."""
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _dispatch(self, method):
+                length = int(self.headers.get('Content-Length') or 0)
+                body = json.loads(self.rfile.read(length)) if length else None
+                status, payload, headers = fake.handle(method, self.path, body)
+                data = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', "application/json")
+                self.send_header('Content-Length', str(len(data)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                self._dispatch("GET")
+
+            def do_POST(self):
+                self._dispatch("POST")
+
+            def do_PUT(self):
+                self._dispatch("PUT")
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return f"http://{host}:{self.server.server_port}{API_PREFIX}"
+
+    def stop(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+def populate_account(fake, num_templates, first_set=12, last_set=50, designs=10, stories=3,
+                     stale_fraction=0.1, missing_fraction=0.1, seed=0):
+    """Fills the fake account with about num_templates conventionally named templates.
+
+    Platform sets first_set..last_set come first; the rest are tenant copies
+    ("tenant<i>_Template<n>_...") like the ones duplicate-bulk.js makes. Existing
+    sets are created for most groups, some of them out of date.
+    """
+    rng = random.Random(seed)
+    per_set = designs + stories
+    groups = []
+    tenant = 0
+    set_number = first_set
+    while len(groups) * per_set < num_templates:
+        groups.append((None if tenant == 0 else f"tenant{tenant}", set_number))
+        set_number += 1
+        if set_number > last_set:
+            tenant += 1
+            set_number = first_set
+    for prefix, set_number in groups:
+        names = [f"Template{set_number}_design{n}" for n in range(1, designs + 1)]
+        names += [f"Template{set_number}_Story{n}" for n in range(1, stories + 1)]
+        if prefix:
+            names = [f"{prefix}_{name}" for name in names]
+        uids = [fake.add_template(name)['uid'] for name in names]
+        roll = rng.random()
+        if roll < missing_fraction:
+            continue
+        if roll < missing_fraction + stale_fraction:
+            uids = uids[:-1]
+        # Tenant sets are named the way duplicate-bulk.js names them
+        set_name = f"Template Set {set_number}" if prefix is None else f"{prefix}_Template{set_number}_design1_Set"
+        fake.add_template_set(set_name, uids)
+    return len(groups)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a local stand-in for the Bannerbear template/template set API.")
+    parser.add_argument("--port", type=int, default=8787)
+    parser.add_argument("--templates", type=int, default=1000, help="Number of templates to seed the account with")
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds added to every response")
+    parser.add_argument("--rate-limit", type=float, default=None, help="Requests per second before answering 429")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Fraction of requests answered with a 500")
+    args = parser.parse_args()
+
+    fake = FakeBannerbear(latency=args.latency, rate_limit=args.rate_limit, failure_rate=args.failure_rate)
+    populate_account(fake, args.templates)
+    base_url = fake.start(port=args.port)
+    print(f"Fake Bannerbear API with {len(fake.templates)} templates and {len(fake.template_sets)} sets at {base_url}")
+    print(f"Run the sync with BANNERBEAR_BASE_URL={base_url} BANNERBEAR_API_KEY=fake")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print(f"\nRequest counts: {fake.counts}")
+        fake.stop()
@@ -0,0 +1,144 @@
+import argparse
+import io
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import font_store
+from font_pairings import load_font_pairings, pairing_families
+from download_fonts import format_font_face
+
+# Subset files are content-addressed like the full downloads, in their own folder
+SUBSET_DIR = font_store.FONT_STORE_DIR / "subset"
+SUBSET_MANIFEST_FILE = Path("font_subset_manifest.json")
+SUBSET_CSS_FILE = Path("generated_font_faces_subset.css")
+
+# Characters the templates render: Latin + Latin-1, typographic punctuation,
+# currency signs, and property symbols (m², №, ™, arrows, house, star, tick)
+DEFAULT_UNICODES = (
+    "U+0020-007E, U+00A0-00FF, U+0131, U+0152-0153, U+02C6, U+02DA, U+02DC, "
+    "U+2013-2014, U+2018-201E, U+2022, U+2026, U+2030, U+2039-203A, U+20A0-20C0, "
+    "U+2116, U+2122, U+2190-2193, U+2302, U+2605, U+2713"
+)
+
+def parse_unicode_range(value):
+    """Parses a CSS unicode-range value into a set of code points."""
+    codepoints = set()
+    for first, last in font_store.parse_unicode_ranges(value):
+        codepoints.update(range(first, last + 1))
+    return codepoints
+
+def format_unicode_range(codepoints):
+    """Formats code points as a compact CSS unicode-range value."""
+    parts = []
+    ordered = sorted(codepoints)
+    i = 0
+    while i < len(ordered):
+        j = i
+        while j + 1 < len(ordered) and ordered[j + 1] == ordered[j] + 1:
+            j += 1
+        if i == j:
+            parts.append(f"U+{ordered[i]:04X}")
+        else:
+            parts.append(f"U+{ordered[i]:04X}-{ordered[j]:04X}")
+        i = j + 1
+    return ", ".join(parts)
+
+def wanted_codepoints(face, codepoints):
+    """The requested code points that fall inside a face's unicode-range."""
+    if not face['unicode_range']:
+        return set(codepoints)
+    return codepoints & parse_unicode_range(face['unicode_range'])
+
+def subset_font_file(source_path, codepoints):
+    """Subsets one font to the given code points. Runs in a worker process.
+
+    Returns (woff2 bytes, covered code points), or (None, empty set) if the
+    font has none of the requested characters.
+    """
+    from fontTools import subset
+    from fontTools.ttLib import TTFont
+
+    font = TTFont(source_path)
+    covered = set(font.getBestCmap() or {}) & set(codepoints)
+    if not covered:
+        return None, set()
+    options = subset.Options()
+    options.flavor = "woff2"
+    subsetter = subset.Subsetter(options=options)
+    subsetter.populate(unicodes=sorted(covered))
+    subsetter.subset(font)
+    buffer = io.BytesIO()
+    font.save(buffer)
+    return buffer.getvalue(), covered
+
+def subset_fonts(codepoints, families=None, manifest_path=font_store.FONT_MANIFEST_FILE, max_workers=None):
+    try:
+        import fontTools  # noqa: F401
+    except ImportError:
+        print("Error: fontTools is required for subsetting (pip install fonttools brotli).", file=sys.stderr)
+        sys.exit(1)
+
+    if families is None:
+        families = pairing_families(load_font_pairings())
+    manifest = font_store.load_manifest(manifest_path)
+    faces = [face for face in manifest['faces'] if face['family'] in families]
+    if not faces:
+        print(f"No manifest faces found for the requested families in {manifest_path}. Run download_fonts.py first.")
+        return
+
+    # One job per distinct (source file, requested characters) pair; variable fonts share a file
+    jobs = {}
+    for face in faces:
+        wanted = wanted_codepoints(face, codepoints)
+        if not wanted:
+            continue
+        jobs.setdefault((face['sha256'], frozenset(wanted)), face)
+
+    print(f"Subsetting {len(jobs)} font files for {len(families)} families...")
+    results = {}
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            key: executor.submit(subset_font_file, str(font_store.FONT_STORE_DIR / face['file']), key[1])
+            for key, face in jobs.items()
+        }
+        for key, future in futures.items():
+            data, covered = future.result()
+            if data is None:
+                continue
+            entry = font_store.store_font_bytes(data, ".woff2", SUBSET_DIR)
+            entry['file'] = f"{SUBSET_DIR.name}/{entry['file']}"
+            results[key] = (entry, covered)
+
+    subset_faces = []
+    for face in faces:
+        result = results.get((face['sha256'], frozenset(wanted_codepoints(face, codepoints))))
+        if not result:
+            continue
+        entry, covered = result
+        subset_faces.append(dict(face, unicode_range=format_unicode_range(covered), **entry))
+
+    font_store.save_manifest(subset_faces, SUBSET_MANIFEST_FILE)
+    with open(SUBSET_CSS_FILE, "w", encoding="utf-8") as f:
+        for face in subset_faces:
+            f.write(format_font_face(face))
+
+    original_bytes = sum({face['sha256']: face['size'] for face in faces}.values())
+    subset_bytes = sum({face['sha256']: face['size'] for face in subset_faces}.values())
+    print(f"Subset {len(faces)} faces -> {len(subset_faces)} faces "
+          f"({original_bytes / 1024:.0f} KB -> {subset_bytes / 1024:.0f} KB).")
+    print(f"CSS written to {SUBSET_CSS_FILE}, manifest to {SUBSET_MANIFEST_FILE}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Subset downloaded fonts to the characters the templates use.")
+    parser.add_argument("--unicodes", default=DEFAULT_UNICODES,
+                        help="CSS unicode-range style list of code points to keep")
+    parser.add_argument("--text", default="",
+                        help="Extra literal characters to keep")
+    parser.add_argument("--family", action="append", dest="families",
+                        help="Only subset this family (repeatable; default: every FONT_PAIRINGS family)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Worker processes (default: CPU count)")
+    args = parser.parse_args()
+    codepoints = parse_unicode_range(args.unicodes) | {ord(c) for c in args.text}
+    subset_fonts(codepoints, families=args.families, max_workers=args.workers)
@@ -0,0 +1,84 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import rename_fonts
+
+# Rollback of rename batches whose targets are other files' current names (swaps and chains)
+class RenameRollbackTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        font_dir = os.path.join(self.tmp_dir.name, "fonts")
+        os.makedirs(font_dir)
+        for name, value in (('FONT_DIR', font_dir), ('JOURNAL_FILE', os.path.join(self.tmp_dir.name, "journal.json"))):
+            patcher = mock.patch.object(rename_fonts, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def write_files(self, contents):
+        for name, data in contents.items():
+            with open(os.path.join(rename_fonts.FONT_DIR, name), "w", encoding="utf-8") as f:
+                f.write(data)
+
+    def read_files(self):
+        result = {}
+        for name in os.listdir(rename_fonts.FONT_DIR):
+            with open(os.path.join(rename_fonts.FONT_DIR, name), "r", encoding="utf-8") as f:
+                result[name] = f.read()
+        return result
+
+    def apply_and_roll_back(self, contents, plan):
+        self.write_files(contents)
+        rename_fonts.apply_renames(plan)
+        self.assertEqual(self.read_files(), {plan.get(name, name): data for name, data in contents.items()})
+        rename_fonts.rollback()
+        self.assertEqual(self.read_files(), contents)
+        self.assertEqual(rename_fonts.load_journal()['state'], 'rolled-back')
+
+    def test_swap_rolls_back(self):
+        self.apply_and_roll_back(
+            {'a-normal-400.woff2': "A400", 'a-normal-700.woff2': "A700"},
+            {'a-normal-400.woff2': 'a-normal-700.woff2', 'a-normal-700.woff2': 'a-normal-400.woff2'},
+        )
+
+    def test_chain_rolls_back(self):
+        self.apply_and_roll_back(
+            {'x.woff2': "X", 'y.woff2': "Y"},
+            {'x.woff2': 'z.woff2', 'y.woff2': 'x.woff2'},
+        )
+
+    def test_failure_partway_keeps_every_file(self):
+        contents = {'a.woff2': "A", 'b.woff2': "B"}
+        self.write_files(contents)
+        real_rename = os.rename
+        failed = []
+
+        def failing_rename(src, dst):
+            # The second phase-2 move of the chain a -> b, b -> c fails once
+            if dst.endswith("c.woff2") and not failed:
+                failed.append(dst)
+                raise OSError("simulated failure")
+            real_rename(src, dst)
+
+        with mock.patch.object(rename_fonts.os, 'rename', failing_rename):
+            with self.assertRaises(OSError):
+                rename_fonts.apply_renames({'a.woff2': 'b.woff2', 'b.woff2': 'c.woff2'})
+        self.assertEqual(self.read_files(), contents)
+        self.assertEqual(rename_fonts.load_journal()['state'], 'rolled-back')
+
+    def test_interrupted_batch_rolls_back_from_journal(self):
+        contents = {'a.woff2': "A", 'b.woff2': "B"}
+        self.write_files(contents)
+        renames = [('a.woff2', 'b.woff2'), ('b.woff2', 'c.woff2')]
+        # State on disk after a crash between the two phase-2 moves
+        rename_fonts.write_journal(renames, 'renaming')
+        for old, _ in renames:
+            os.rename(os.path.join(rename_fonts.FONT_DIR, old), os.path.join(rename_fonts.FONT_DIR, old + rename_fonts.TEMP_SUFFIX))
+        os.rename(os.path.join(rename_fonts.FONT_DIR, "a.woff2" + rename_fonts.TEMP_SUFFIX), os.path.join(rename_fonts.FONT_DIR, "b.woff2"))
+        rename_fonts.rollback()
+        self.assertEqual(self.read_files(), contents)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,17 +1,36 @@
 import os
 import re
+import json
+import hashlib
+from font_store import is_store_name, clean_family, parse_unicode_ranges
+from font_metadata import read_font_directory, weight_bounds
 
 FONT_DIR = "public/fonts"
 CSS_FILE = "generated_font_faces.css"
 OUTPUT_CSS_FILE = "generated_font_faces_updated.css"
+# Rules for the bundled fonts recompressed by convert_fonts.py, appended when present
+CONVERTED_CSS_FILE = "generated_font_faces_converted.css"
+# Per-block resolved file and its stat from the last run, so only blocks whose font files changed are re-resolved
+STATE_FILE = os.path.join(".font_cache", "update_css_state.json")
+CHUNK_SIZE = 64 * 1024
+BLOCK_KEY_LENGTH = 16  # hex digits of each block's SHA-256 kept in the state file
+
+FONT_FACE_START = "@font-face"
+FAMILY_RE = re.compile(r"font-family:\s*'([^']+)'")
+STYLE_RE = re.compile(r"font-style:\s*(\w+)")
+WEIGHT_RE = re.compile(r"font-weight:\s*(\d+(?:\s+\d+)?)")
+UNICODE_RANGE_RE = re.compile(r"unicode-range:\s*([^;]+);")
+SRC_RE = re.compile(r"src:\s*url\([^)]+\)\s*format\('woff2'\);")
+SRC_FILE_RE = re.compile(r"src:\s*url\('?/fonts/([^')]+)'?\)")
+CANONICAL_NAME_RE = re.compile(r'([a-z0-9-]+)-(italic|normal)-(\d{3})(?:-(\d+))?\.woff2')
 
 # Build a lookup of (family, style, weight) -> filename
-def build_font_lookup():
+def build_font_lookup(filenames):
     lookup = {}
-    for fname in os.listdir(FONT_DIR):
+    for fname in filenames:
         if not fname.endswith('.woff2'):
             continue
-        m = re.match(r'([a-z0-9-]+)-(italic|normal)-(\d{3})(?:-(\d+))?\.woff2', fname)
+        m = CANONICAL_NAME_RE.match(fname)
         if m:
             family, style, weight, counter = m.groups()
             key = (family, style, weight)
@@ -20,8 +39,38 @@ def build_font_lookup():
                 lookup[key] = fname
     return lookup
 
-def clean_family(name):
-    return re.sub(r'[^a-z0-9]+', '-', name.lower()).strip('-')
+# Build a lookup of (family, style) -> [(min weight, max weight, cmap ranges, filename)]
+# from the identity stored in the font binaries themselves
+def build_metadata_lookup(filenames):
+    filenames = [f for f in filenames if f.endswith('.woff2') and not is_store_name(f)]
+    lookup = {}
+    for fname, meta in sorted(read_font_directory(FONT_DIR, filenames=filenames).items()):
+        if not meta['family']:
+            continue
+        low, high = weight_bounds(meta['weight'])
+        key = (clean_family(meta['family']), meta['style'])
+        lookup.setdefault(key, []).append((low, high, meta['cmap_ranges'], fname))
+    return lookup
+
+def coverage(block_ranges, cmap_ranges):
+    # Number of code points in the block's unicode-range that the font actually maps
+    return sum(
+        max(0, min(end, cmap_end) - max(start, cmap_start) + 1)
+        for start, end in block_ranges
+        for cmap_start, cmap_end in cmap_ranges
+    )
+
+def find_font_file_by_metadata(lookup, family, style, weight, unicode_range):
+    low, high = weight_bounds(weight)
+    candidates = [c for c in lookup.get((family, style), []) if c[0] <= low and high <= c[1]]
+    if not candidates:
+        return None
+    if not unicode_range:
+        # Prefer the narrowest weight range (a static face over a variable one)
+        return min(candidates, key=lambda c: (c[1] - c[0], c[3]))[3]
+    block_ranges = parse_unicode_ranges(unicode_range)
+    best = max(candidates, key=lambda c: (coverage(block_ranges, c[2]), c[0] - c[1]))
+    return best[3] if coverage(block_ranges, best[2]) else None
 
 def find_font_file(lookup, family, style, weight):
     # Try exact match
@@ -42,42 +91,195 @@ def find_font_file(lookup, family, style, weight):
         return lookup[key4]
     return None
 
-def update_css():
-    lookup = build_font_lookup()
-    with open(CSS_FILE, "r", encoding="utf-8") as f:
-        css = f.read()
-
-    def fontface_replacer(block):
-        family = re.search(r"font-family:\s*'([^']+)'", block)
-        style = re.search(r"font-style:\s*(\w+)", block)
-        weight = re.search(r"font-weight:\s*(\d+)", block)
-        if not (family and style and weight):
-            return block
-        family_clean = clean_family(family.group(1))
-        style_val = style.group(1)
-        weight_val = weight.group(1)
-        fname = find_font_file(lookup, family_clean, style_val, weight_val)
-        if not fname:
-            print(f"Warning: No font file found for ({family_clean}, {style_val}, {weight_val})")
-            return block
-        # Replace the src line
-        block = re.sub(
-            r"src:\s*url\([^)]+\)\s*format\('woff2'\);",
-            f"src: url('/fonts/{fname}') format('woff2');",
-            block
-        )
-        return block
-
-    # Replace all @font-face blocks
-    css_updated = re.sub(
-        r"(@font-face\s*\{[^}]+\})",
-        lambda m: fontface_replacer(m.group(1)),
-        css
-    )
+def iter_css_tokens(f, chunk_size=CHUNK_SIZE):
+    """Yields ('text', str) and ('font-face', str) tokens while reading f chunk by chunk."""
+    buffer = ""
+    pos = 0
+    eof = False
+    while True:
+        start = buffer.find(FONT_FACE_START, pos)
+        end = buffer.find("}", start) if start != -1 else -1
+        if end != -1:
+            if start > pos:
+                yield 'text', buffer[pos:start]
+            yield 'font-face', buffer[start:end + 1]
+            pos = end + 1
+            continue
+        if eof:
+            if pos < len(buffer):
+                yield 'text', buffer[pos:]
+            return
+        # Flush text that cannot be part of a block, keeping a possibly split "@font-face"
+        flush_to = start if start != -1 else max(pos, len(buffer) - len(FONT_FACE_START) + 1)
+        if flush_to > pos:
+            yield 'text', buffer[pos:flush_to]
+        buffer = buffer[flush_to:]
+        pos = 0
+        chunk = f.read(chunk_size)
+        if chunk:
+            buffer += chunk
+        else:
+            eof = True
+
+class FontLookups:
+    """Builds the directory lookups on first use, so runs with nothing to resolve never need them."""
+    def __init__(self, filenames):
+        self.filenames = filenames
+        self._lookups = None
+
+    def resolve(self, family, style, weight, unicode_range):
+        if self._lookups is None:
+            self._lookups = (build_font_lookup(self.filenames), build_metadata_lookup(self.filenames))
+        lookup, metadata_lookup = self._lookups
+        return find_font_file_by_metadata(
+            metadata_lookup, family, style, weight, unicode_range
+        ) or find_font_file(lookup, family, style, weight.split()[0])
+
+def point_src(block, fname):
+    # Replace the src line
+    return SRC_RE.sub(f"src: url('/fonts/{fname}') format('woff2');", block)
+
+def rewrite_block(block, lookups):
+    """Returns (block with its src pointed at the matching file, result info for the state file)."""
+    # Blocks written by download_fonts.py already point at content-addressed files
+    src = SRC_FILE_RE.search(block)
+    if src and is_store_name(src.group(1)):
+        return block, {'family': None, 'file': None}
+    family = FAMILY_RE.search(block)
+    style = STYLE_RE.search(block)
+    weight = WEIGHT_RE.search(block)
+    unicode_range = UNICODE_RANGE_RE.search(block)
+    if not (family and style and weight):
+        return block, {'family': None, 'file': None}
+    family_clean = clean_family(family.group(1))
+    style_val = style.group(1)
+    weight_val = weight.group(1)
+    fname = lookups.resolve(family_clean, style_val, weight_val, unicode_range.group(1) if unicode_range else None)
+    if not fname:
+        print(f"Warning: No font file found for ({family_clean}, {style_val}, {weight_val})")
+        return block, {'family': family_clean, 'file': None}
+    return point_src(block, fname), {'family': family_clean, 'file': fname}
+
+def load_state():
+    try:
+        with open(STATE_FILE, "r", encoding="utf-8") as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if state.get('css_file') != CSS_FILE or state.get('font_dir') != os.path.abspath(FONT_DIR) or 'stats' not in state:
+        return None
+    return state
+
+def save_state(dir_mtime, families, blocks, stats):
+    os.makedirs(os.path.dirname(STATE_FILE), exist_ok=True)
+    tmp_path = STATE_FILE + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({
+            'css_file': CSS_FILE,
+            'font_dir': os.path.abspath(FONT_DIR),
+            'dir_mtime': dir_mtime,
+            'families': families,
+            'blocks': blocks,
+            'stats': stats,
+        }, f, separators=(',', ':'))
+    os.replace(tmp_path, STATE_FILE)
+
+def family_listings(filenames):
+    """{clean family: short digest of its file names}; None if a file cannot be identified.
+
+    Content-addressed files are left out: blocks never resolve to them.
+    """
+    filenames = sorted(f for f in filenames if not is_store_name(f))
+    metadata = read_font_directory(FONT_DIR, filenames=filenames)
+    by_family = {}
+    for fname in filenames:
+        if fname in metadata and metadata[fname]['family']:
+            family = clean_family(metadata[fname]['family'])
+        else:
+            m = CANONICAL_NAME_RE.match(fname)
+            if not m:
+                return None
+            family = m.group(1)
+        by_family.setdefault(family, []).append(fname)
+    return {
+        family: hashlib.sha256("\n".join(names).encode('utf-8')).hexdigest()[:16]
+        for family, names in by_family.items()
+    }
+
+def file_stat(fname):
+    try:
+        st = os.stat(os.path.join(FONT_DIR, fname))
+    except OSError:
+        return None
+    return [st.st_mtime_ns, st.st_size]
+
+def update_css(full=False):
+    files = {f for f in os.listdir(FONT_DIR) if f.endswith('.woff2')}
+    dir_mtime = os.stat(FONT_DIR).st_mtime_ns
+    state = None if full else load_state()
+    cached_blocks = state['blocks'] if state else {}
+    # Added, removed or renamed files can only change the answer for blocks of their own family;
+    # the listing is only regrouped by family when the directory itself changed
+    if state and state['dir_mtime'] == dir_mtime:
+        families = state['families']
+    else:
+        families = family_listings(files)
+    if state and state['families'] is not None and families is not None:
+        dirty_families = {
+            family for family in set(families) | set(state['families'])
+            if families.get(family) != state['families'].get(family)
+        }
+    else:
+        dirty_families = set()
+        cached_blocks = {}
+
+    cached_stats = state['stats'] if state else {}
+    current_stats = {}
+
+    def current_stat(fname):
+        if fname not in current_stats:
+            current_stats[fname] = file_stat(fname)
+        return current_stats[fname]
 
-    with open(OUTPUT_CSS_FILE, "w", encoding="utf-8") as f:
-        f.write(css_updated)
+    lookups = FontLookups(sorted(files))
+    blocks = {}
+    rewritten = 0
+    total = 0
+    tmp_output = OUTPUT_CSS_FILE + ".tmp"
+    css_files = [CSS_FILE] + ([CONVERTED_CSS_FILE] if os.path.exists(CONVERTED_CSS_FILE) else [])
+    with open(tmp_output, "w", encoding="utf-8") as out:
+        for css_file in css_files:
+            with open(css_file, "r", encoding="utf-8") as src:
+                for kind, token in iter_css_tokens(src):
+                    if kind == 'text':
+                        out.write(token)
+                        continue
+                    total += 1
+                    key = hashlib.sha256(token.encode('utf-8')).hexdigest()[:BLOCK_KEY_LENGTH]
+                    # [family, resolved file]; the file's stat is kept once in cached_stats
+                    entry = cached_blocks.get(key)
+                    reusable = (
+                        entry is not None
+                        and entry[0] not in dirty_families
+                        and (entry[1] is None or current_stat(entry[1]) == cached_stats.get(entry[1]))
+                    )
+                    if reusable:
+                        output = point_src(token, entry[1]) if entry[1] else token
+                    else:
+                        output, info = rewrite_block(token, lookups)
+                        entry = [info['family'], info['file']]
+                        rewritten += 1
+                    blocks[key] = entry
+                    out.write(output)
+    os.replace(tmp_output, OUTPUT_CSS_FILE)
+    stats = {fname: current_stat(fname) for _, fname in blocks.values() if fname}
+    save_state(dir_mtime, families, blocks, stats)
+    print(f"Re-resolved {rewritten} of {total} @font-face blocks.")
     print(f"Updated CSS written to {OUTPUT_CSS_FILE}")
 
 if __name__ == "__main__":
-    update_css() 
\ No newline at end of file
+    import argparse
+    parser = argparse.ArgumentParser(description="Point @font-face src URLs at the renamed files in public/fonts.")
+    parser.add_argument("--full", action="store_true", help="Ignore the saved state and re-resolve every block")
+    args = parser.parse_args()
+    update_css(full=args.full)